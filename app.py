@@ -1,12 +1,24 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Header, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, PlainTextResponse, StreamingResponse
 import uvicorn
 import os
-from typing import Optional
+from typing import List, Optional
 import asyncio
+import base64
 import gc
+import json
+import tempfile
 from model.srgan_wrapper import SRGANWrapper
+from model.inference_pool import QueueFullError
+from model.jobs import JobManager, JobLimitError
+from model.deadline import Deadline, RequestCancelled, DISCONNECTED, EXPIRED
+from utils import image_encoding
+from utils.batch_input import is_zip, list_zip, read_item, spool
+from utils.config import env_int, env_float, env_str
+from utils.metrics import METRICS
+from utils.upload_limit import ImageTooLargeError, UploadLimitMiddleware
 
 class FastAPIApp:
     def __init__(self):
@@ -21,15 +33,46 @@ class FastAPIApp:
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=["X-Quality-Tier"],
         )
         
+        # Лимит размера загрузки проверяется по мере поступления тела запроса
+        self.max_upload_bytes = env_int("SRGAN_MAX_UPLOAD_MB", 32) * 1024 * 1024
+        self.app.add_middleware(UploadLimitMiddleware, max_bytes=self.max_upload_bytes)
+        
         # Инициализация компонентов
         self.srgan = SRGANWrapper()
         self.ready = False
         
+        # Ограничения пакетной обработки
+        self.batch_max_items = env_int("SRGAN_BATCH_MAX_ITEMS", 64)
+        self.batch_concurrency = env_int("SRGAN_BATCH_CONCURRENCY", self.srgan.pool.workers * 2)
+        # Суммарный объем распакованных из zip изображений одного пакета
+        self.batch_max_inflated = env_int("SRGAN_BATCH_MAX_INFLATED_MB", 256) * 1024 * 1024
+        
+        # Срок обработки запроса по умолчанию (0 - без срока) и период проверки отключения клиента
+        self.request_timeout = env_float("SRGAN_REQUEST_TIMEOUT_SEC", 0.0)
+        self.disconnect_poll = env_float("SRGAN_DISCONNECT_POLL_MS", 100.0) / 1000.0
+        
+        # Асинхронные задания с хранилищем на диске (запускаются после загрузки модели)
+        self.jobs = JobManager(
+            self.srgan,
+            env_str("SRGAN_JOBS_DIR", "/app/models/jobs"),
+            workers=env_int("SRGAN_JOB_WORKERS", 1),
+            retention_sec=env_float("SRGAN_JOB_RETENTION_HOURS", 24.0) * 3600,
+            callback_timeout=env_float("SRGAN_JOB_CALLBACK_TIMEOUT", 10.0),
+            max_pending=env_int("SRGAN_JOBS_MAX_PENDING", 100),
+            max_disk_bytes=env_int("SRGAN_JOBS_MAX_DISK_MB", 2048) * 1024 * 1024,
+            callback_hosts=[host.strip() for host in env_str("SRGAN_JOB_CALLBACK_HOSTS", "").split(",") if host.strip()]
+        )
+        
         # Настройка маршрутов и событий
         self.setup_routes()
         
+        # Показатели очереди инференса в /metrics
+        METRICS.add_gauge("srgan_inference_queued", "Запросы в очереди инференса", lambda: self.srgan.pool.queued)
+        METRICS.add_gauge("srgan_inference_running", "Запросы в работе у пула инференса", lambda: self.srgan.pool.running)
+        
         # Регистрация обработчика завершения работы
         self.app.add_event_handler("shutdown", self.cleanup)
     
@@ -38,6 +81,7 @@ class FastAPIApp:
         try:
             await self.srgan.load_model()
             self.ready = True
+            await self.jobs.start()
             return True
         except Exception as e:
             self.ready = False
@@ -45,41 +89,249 @@ class FastAPIApp:
 
     def is_ready(self):
         """Проверка готовности модели"""
-        return self.ready and hasattr(self.srgan, 'model') and self.srgan.model is not None
+        return self.ready and self.srgan.is_ready()
 
     async def cleanup(self):
         """Очистка ресурсов при завершении работы сервера"""
         try:
-            if hasattr(self, "srgan") and self.srgan.model:
-                # Удаление модели
-                del self.srgan.model
-                self.srgan.model = None
-                
+            await self.jobs.stop()
+            if hasattr(self, "srgan"):
+                # Выгрузка моделей из реестра (модель по умолчанию могла быть уже вытеснена)
+                self.srgan.registry.clear()
+                self.srgan.ready = False
+
+                # Остановка пула инференса и процессов-реплик
+                self.srgan.pool.shutdown()
+                self.srgan.fallback_pool.shutdown()
+                if self.srgan.replicas is not None:
+                    self.srgan.replicas.shutdown()
+
                 # Принудительный вызов сборщика мусора
                 gc.collect()
-                
+
                 print("Ресурсы модели SRGAN успешно освобождены")
         except Exception as e:
             print(f"Ошибка при очистке ресурсов: {str(e)}")
 
+    def make_deadline(self, timeout_header: Optional[float]) -> Deadline:
+        """Срок запроса из заголовка X-Request-Timeout (секунды), не больше настроенного"""
+        timeout = self.request_timeout
+        if timeout_header is not None and timeout_header > 0:
+            timeout = min(timeout, timeout_header) if timeout > 0 else timeout_header
+        return Deadline(timeout)
+
+    async def run_with_deadline(self, request: Request, coro, deadline: Deadline):
+        """
+        Ожидание обработки с контролем срока и отключения клиента. При отмене
+        задача снимается: ожидающая в очереди работа не начнется, а выполняемая
+        прервется в ближайшей безопасной точке.
+        """
+        task = asyncio.ensure_future(coro)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.disconnect_poll)
+                if done:
+                    return task.result()
+                if await request.is_disconnected():
+                    deadline.cancel(DISCONNECTED)
+                elif deadline.reason() is None:
+                    continue
+                deadline.record("waiting")
+                raise RequestCancelled(deadline.reason())
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def spool_batch(self, files: List[UploadFile]) -> tuple:
+        """
+        Подготовка пакета: загрузки копируются во временный каталог (загруженные
+        файлы закрываются до начала потокового ответа), zip-архивы описываются
+        по оглавлению без распаковки. Возвращает каталог и список источников
+        [(имя, путь, ZipInfo или None)]; сами изображения читаются по мере обработки.
+        """
+        workdir = tempfile.TemporaryDirectory(prefix="srgan-batch-")
+        try:
+            sources = []
+            declared = 0
+            for number, file in enumerate(files):
+                if is_zip(file.filename, file.content_type):
+                    kind = "zip"
+                elif (file.content_type or "").startswith("image/"):
+                    kind = "image"
+                else:
+                    raise ValueError(f"Файл {file.filename} не является изображением или zip-архивом")
+                path = os.path.join(workdir.name, f"{number}.{kind}")
+                await asyncio.to_thread(spool, file.file, path)
+
+                if kind == "zip":
+                    budget = self.batch_max_inflated - declared if self.batch_max_inflated > 0 else None
+                    members = await asyncio.to_thread(
+                        list_zip, path, self.batch_max_items - len(sources), self.max_upload_bytes, budget
+                    )
+                    declared += sum(info.file_size for info in members)
+                    sources.extend((info.filename, path, info) for info in members)
+                else:
+                    sources.append((file.filename, path, None))
+                if len(sources) > self.batch_max_items:
+                    raise ValueError(f"Слишком много изображений в пакете (максимум {self.batch_max_items})")
+            if not sources:
+                raise ValueError("Пакет не содержит изображений")
+            return workdir, sources
+        except BaseException:
+            workdir.cleanup()
+            raise
+
+    async def stream_batch(self, workdir, sources: list, scale_factor: int, options: dict, model_tier: str,
+                           deadline: Deadline):
+        """
+        Обработка пакета через общий путь инференса с выдачей NDJSON-строк
+        по мере готовности. Ошибка отдельного изображения не прерывает пакет.
+
+        Изображения читаются по одному по мере освобождения мест: в памяти
+        одновременно не больше batch_concurrency входов и готовых результатов,
+        а медленный клиент останавливает чтение и обработку следующих.
+        """
+        concurrency = max(1, self.batch_concurrency)
+        results = asyncio.Queue(maxsize=concurrency)
+        slots = asyncio.Semaphore(concurrency)
+        tasks = []
+
+        def error_line(index: int, filename: str, detail: str) -> str:
+            line = {"index": index, "filename": filename, "status": "error", "detail": detail}
+            return json.dumps(line, ensure_ascii=False) + "\n"
+
+        async def process(index: int, filename: str, data: bytes):
+            line = {"index": index, "filename": filename}
+            try:
+                result, quality_tier = await self.srgan.upscale_adaptive(
+                    data, scale_factor, options, model_tier, deadline
+                )
+                del data
+                if result:
+                    line.update(
+                        status="success",
+                        quality_tier=quality_tier,
+                        image=base64.b64encode(result).decode("utf-8")
+                    )
+                else:
+                    METRICS.errors.inc(cause="processing_failed")
+                    line.update(status="error", detail="Ошибка при обработке изображения")
+            except QueueFullError:
+                METRICS.errors.inc(cause="queue_full")
+                line.update(status="error", detail="Сервер перегружен, повторите запрос позже")
+            except RequestCancelled as e:
+                deadline.record("waiting")
+                line.update(status="error", detail="Истек срок обработки запроса" if e.reason == EXPIRED else str(e))
+            except Exception as e:
+                METRICS.errors.inc(cause="internal")
+                line.update(status="error", detail=str(e))
+            # Результат передается потребителю и не удерживается задачей;
+            # место освобождается, только когда потребитель принял строку
+            await results.put(json.dumps(line, ensure_ascii=False) + "\n")
+            slots.release()
+
+        async def produce():
+            # Фактически распакованный объем (заголовки архива могут занижать размеры)
+            inflated = 0
+            for index, (filename, path, member) in enumerate(sources):
+                await slots.acquire()
+                try:
+                    if member is not None:
+                        limits = [self.max_upload_bytes] if self.max_upload_bytes > 0 else []
+                        if self.batch_max_inflated > 0:
+                            remaining = self.batch_max_inflated - inflated
+                            if remaining <= 0:
+                                raise ValueError("Распакованный объем архива превышает лимит")
+                            limits.append(remaining)
+                        data = await asyncio.to_thread(read_item, path, member, min(limits, default=0))
+                        inflated += len(data)
+                    else:
+                        data = await asyncio.to_thread(read_item, path)
+                except Exception as e:
+                    METRICS.errors.inc(cause="bad_request")
+                    await results.put(error_line(index, filename, str(e)))
+                    slots.release()
+                    continue
+                tasks.append(asyncio.ensure_future(process(index, filename, data)))
+                del data
+
+        producer = asyncio.ensure_future(produce())
+        finished = False
+        try:
+            for _ in range(len(sources)):
+                yield await results.get()
+            finished = True
+        finally:
+            # Клиент отключился раньше конца пакета - оставшаяся работа отменяется.
+            # После выдачи всех строк задачи могут еще не успеть завершиться,
+            # но пакет уже обработан и отключением не считается
+            if not finished:
+                deadline.cancel(DISCONNECTED)
+            for future in [producer, *tasks]:
+                if not future.done():
+                    future.cancel()
+            workdir.cleanup()
+
     def setup_routes(self):
         
         @self.app.get("/")
         async def root_path():
             return {"status": "success", "response": "root"}
+
+        # Метрики в формате Prometheus
+        @self.app.get("/metrics")
+        async def metrics():
+            return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+        # Состояние очереди инференса для операторов
+        @self.app.get("/stats")
+        async def stats():
+            result = {"status": "success", "inference": self.srgan.pool.stats()}
+            result["backend"] = self.srgan.backend_stats()
+            result["boot_to_ready_sec"] = self.srgan.boot_to_ready
+            result["models"] = self.srgan.registry.stats()
+            result["cache"] = self.srgan.cache.stats()
+            if self.srgan.precision_report is not None:
+                result["precision"] = self.srgan.precision_report
+            if self.srgan.batcher is not None:
+                result["batching"] = self.srgan.batcher.stats()
+            result["jobs"] = await self.jobs.stats()
+            result["degrade"] = dict(self.srgan.degrade.stats(), pool=self.srgan.fallback_pool.stats())
+            if self.srgan.replicas is not None:
+                result["replicas"] = self.srgan.replicas.stats()
+            return result
     
         # Маршрут для обработки изображений
         @self.app.post("/upscale")
         async def upscale_image(
+            request: Request,
             file: UploadFile = File(...),
-            scale_factor: Optional[int] = Form(4)
+            scale_factor: Optional[int] = Form(4),
+            response_format: Optional[str] = Form("json"),
+            output_format: Optional[str] = Form("png"),
+            quality: Optional[int] = Form(None, ge=1, le=100),
+            compress_level: Optional[int] = Form(None, ge=0, le=9),
+            model_tier: Optional[str] = Form("standard"),
+            x_request_timeout: Optional[float] = Header(None)
         ):
+            """
+            response_format=json - прежний контракт {"status", "image": <base64>}
+            с полем quality_tier;
+            response_format=binary - закодированное изображение в теле ответа
+            с соответствующим Content-Type и заголовком X-Quality-Tier.
+            Под перегрузкой (SRGAN_FALLBACK) quality_tier может быть bicubic
+            или уровнем более легкой модели.
+            Срок обработки задается заголовком X-Request-Timeout (секунды) или
+            SRGAN_REQUEST_TIMEOUT_SEC; по его истечении возвращается 504.
+            """
             if not self.is_ready():
+                METRICS.errors.inc(cause="not_ready")
                 raise HTTPException(
                     status_code=503,
                     detail="Сервис временно недоступен. Модель не загружена."
                 )
             
+            METRICS.in_flight += 1
             try:
                 # Проверка типа файла
                 if not file.content_type.startswith('image/'):
@@ -88,9 +340,25 @@ class FastAPIApp:
                         detail="Файл должен быть изображением"
                     )
                 
+                if response_format not in ("json", "binary"):
+                    raise HTTPException(
+                        status_code=400,
+                        detail="response_format должен быть json или binary"
+                    )
+                try:
+                    options = image_encoding.output_options(output_format, quality, compress_level)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                
                 # Обработка изображения
-                contents = await file.read()
-                result = await self.srgan.upscale_image(contents, scale_factor)
+                deadline = self.make_deadline(x_request_timeout)
+                with METRICS.time("upload_read"):
+                    contents = await file.read()
+                result, quality_tier = await self.run_with_deadline(
+                    request,
+                    self.srgan.upscale_adaptive(contents, scale_factor, options, model_tier, deadline),
+                    deadline
+                )
                 
                 if not result:
                     raise HTTPException(
@@ -98,12 +366,150 @@ class FastAPIApp:
                         detail="Ошибка при обработке изображения"
                     )
                 
-                return {"status": "success", "image": result}
+                METRICS.requests.inc(response_format=response_format, quality_tier=quality_tier)
+                if response_format == "binary":
+                    return Response(
+                        content=result,
+                        media_type=image_encoding.media_type(options),
+                        headers={"X-Quality-Tier": quality_tier}
+                    )
+                with METRICS.time("base64"):
+                    image = base64.b64encode(result).decode("utf-8")
+                return {"status": "success", "quality_tier": quality_tier, "image": image}
+            except HTTPException as e:
+                METRICS.errors.inc(cause="bad_request" if e.status_code == 400 else "processing_failed")
+                raise
+            except ImageTooLargeError as e:
+                METRICS.errors.inc(cause="too_large")
+                raise HTTPException(status_code=413, detail=str(e))
+            except ValueError as e:
+                # Неподдерживаемый масштаб или параметры запроса
+                METRICS.errors.inc(cause="bad_request")
+                raise HTTPException(status_code=400, detail=str(e))
+            except QueueFullError as e:
+                METRICS.errors.inc(cause="queue_full")
+                raise HTTPException(
+                    status_code=503,
+                    detail="Сервер перегружен, повторите запрос позже",
+                    headers={"Retry-After": str(e.retry_after)}
+                )
+            except RequestCancelled as e:
+                deadline.record("waiting")
+                if e.reason == EXPIRED:
+                    raise HTTPException(status_code=504, detail="Истек срок обработки запроса")
+                # Клиент отключился, ответ никто не прочитает
+                return Response(status_code=499)
             except Exception as e:
+                METRICS.errors.inc(cause="internal")
                 raise HTTPException(
                     status_code=500,
                     detail=f"Ошибка при обработке запроса: {str(e)}"
                 )
+            finally:
+                METRICS.in_flight -= 1
+    
+        # Пакетная обработка: несколько изображений и/или zip-архив, результаты в NDJSON
+        @self.app.post("/upscale/batch")
+        async def upscale_batch(
+            files: List[UploadFile] = File(...),
+            scale_factor: Optional[int] = Form(4),
+            output_format: Optional[str] = Form("png"),
+            quality: Optional[int] = Form(None, ge=1, le=100),
+            compress_level: Optional[int] = Form(None, ge=0, le=9),
+            model_tier: Optional[str] = Form("standard"),
+            x_request_timeout: Optional[float] = Header(None)
+        ):
+            """
+            Каждая строка ответа - JSON-объект {"index", "filename", "status",
+            "image": <base64>} или {"index", "filename", "status": "error", "detail"}
+            в порядке готовности.
+            """
+            if not self.is_ready():
+                METRICS.errors.inc(cause="not_ready")
+                raise HTTPException(
+                    status_code=503,
+                    detail="Сервис временно недоступен. Модель не загружена."
+                )
+            
+            try:
+                options = image_encoding.output_options(output_format, quality, compress_level)
+                self.srgan.registry.resolve(scale_factor, model_tier)
+                workdir, sources = await self.spool_batch(files)
+            except ValueError as e:
+                METRICS.errors.inc(cause="bad_request")
+                raise HTTPException(status_code=400, detail=str(e))
+            
+            return StreamingResponse(
+                self.stream_batch(
+                    workdir, sources, scale_factor, options, model_tier, self.make_deadline(x_request_timeout)
+                ),
+                media_type="application/x-ndjson"
+            )
+    
+        # Асинхронные задания: отправка, статус и результат
+        @self.app.post("/jobs", status_code=202)
+        async def submit_job(
+            file: UploadFile = File(...),
+            scale_factor: Optional[int] = Form(4),
+            output_format: Optional[str] = Form("png"),
+            quality: Optional[int] = Form(None, ge=1, le=100),
+            compress_level: Optional[int] = Form(None, ge=0, le=9),
+            model_tier: Optional[str] = Form("standard"),
+            callback_url: Optional[str] = Form(None)
+        ):
+            """
+            Задание ставится в очередь и выполняется в фоне. Состояние - GET /jobs/{id},
+            результат - GET /jobs/{id}/result. Если задан callback_url, по завершении
+            на него отправляется POST с состоянием задания.
+            """
+            if not self.is_ready() or not self.jobs.started:
+                METRICS.errors.inc(cause="not_ready")
+                raise HTTPException(
+                    status_code=503,
+                    detail="Сервис временно недоступен. Модель не загружена."
+                )
+            
+            try:
+                if not file.content_type.startswith('image/'):
+                    raise ValueError("Файл должен быть изображением")
+                if callback_url:
+                    self.jobs.check_callback(callback_url)
+                options = image_encoding.output_options(output_format, quality, compress_level)
+                self.srgan.registry.resolve(scale_factor, model_tier)
+            except ValueError as e:
+                METRICS.errors.inc(cause="bad_request")
+                raise HTTPException(status_code=400, detail=str(e))
+            
+            contents = await file.read()
+            try:
+                job = await self.jobs.submit(contents, scale_factor, options, model_tier, callback_url)
+            except JobLimitError as e:
+                METRICS.errors.inc(cause="jobs_full")
+                raise HTTPException(status_code=503, detail=str(e))
+            return {"status": "success", "job": job}
+        
+        async def find_job(job_id: str) -> dict:
+            if not self.jobs.started:
+                raise HTTPException(status_code=503, detail="Сервис заданий не запущен")
+            job = await self.jobs.get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail="Задание не найдено")
+            return job
+        
+        @self.app.get("/jobs/{job_id}")
+        async def job_status(job_id: str):
+            job = await find_job(job_id)
+            return {"status": "success", "job": self.jobs.describe(job)}
+        
+        @self.app.get("/jobs/{job_id}/result")
+        async def job_result(job_id: str):
+            job = await find_job(job_id)
+            if job["status"] != "done":
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Результат недоступен, статус задания: {job['status']}"
+                )
+            return Response(content=await self.jobs.result(job_id), media_type=job["media_type"])
     
     def run(self, host="0.0.0.0", port=8000):
         """Запуск приложения"""
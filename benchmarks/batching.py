@@ -0,0 +1,77 @@
+"""
+Сравнение пропускной способности батчевого и небатчевого инференса генератора.
+
+Запуск: python -m benchmarks.batching --concurrency 8 --requests 32 --size 64
+Используются случайные веса, скачивание чекпоинта не требуется.
+"""
+import argparse
+import asyncio
+import json
+import time
+import torch
+
+from model.generator import Generator
+from model.inference_pool import InferencePool
+from model.batcher import BatchScheduler, collate
+
+
+async def _serve(model, pool, batcher, concurrency: int, requests: int, size: int) -> dict:
+    def forward(x):
+        with torch.no_grad():
+            return model(x)
+
+    async def run_batch(tensors, shape, group, admissions):
+        # Как в сервисе: запросы батча уже допущены, батчевый проход не отклоняется
+        return await pool.run_shared(admissions, lambda: forward(collate(tensors, shape)))
+
+    if batcher is not None:
+        batcher.run_batch = run_batch
+
+    async def client(count: int):
+        for _ in range(count):
+            x = torch.rand(1, 3, size, size)
+            if batcher is None:
+                await pool.run(forward, x)
+            else:
+                with pool.admit() as admission:
+                    await batcher.submit(x, admission=admission)
+
+    per_client = max(1, requests // concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(*[client(per_client) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    total = per_client * concurrency
+    return {"requests": total, "elapsed_sec": elapsed, "images_per_sec": total / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--bucket-policy", choices=["exact", "pad"], default="pad")
+    parser.add_argument("--pad-multiple", type=int, default=64)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    model = Generator(in_channels=3).eval()
+    pool = InferencePool(workers=1, max_queue=args.concurrency * 2)
+
+    unbatched = asyncio.run(_serve(model, pool, None, args.concurrency, args.requests, args.size))
+    batcher = BatchScheduler(None, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                             bucket_policy=args.bucket_policy, pad_multiple=args.pad_multiple)
+    batched = asyncio.run(_serve(model, pool, batcher, args.concurrency, args.requests, args.size))
+    pool.shutdown()
+
+    print(json.dumps({
+        "config": vars(args),
+        "unbatched": unbatched,
+        "batched": dict(batched, avg_batch_size=batcher.stats()["avg_batch_size"]),
+        "speedup": batched["images_per_sec"] / unbatched["images_per_sec"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Проверка численной эквивалентности и задержки оптимизированного генератора.
+
+Запуск: python -m benchmarks.optimize --sizes 64 128 256 --repeats 5
+Используются случайные веса и случайная статистика BatchNorm.
+"""
+import argparse
+import copy
+import json
+import time
+import torch
+import torch.nn as nn
+
+from model.generator import Generator
+from model.optimize import optimize_model, configure_threads
+
+CONFIGS = {
+    "reference": None,
+    "fold_bn": {"fold_bn": True},
+    "fold_bn+channels_last": {"fold_bn": True, "channels_last": True},
+    "fold_bn+trace": {"fold_bn": True, "jit": "trace"},
+    "fold_bn+compile": {"fold_bn": True, "jit": "compile"},
+}
+
+
+def random_generator(seed: int = 0) -> Generator:
+    torch.manual_seed(seed)
+    model = Generator(in_channels=3)
+    for module in model.modules():
+        if isinstance(module, nn.BatchNorm2d):
+            module.running_mean.uniform_(-0.1, 0.1)
+            module.running_var.uniform_(0.5, 1.5)
+            module.weight.data.uniform_(0.5, 1.5)
+            module.bias.data.uniform_(-0.1, 0.1)
+    return model.eval()
+
+
+def measure(model, x: torch.Tensor, repeats: int) -> float:
+    with torch.inference_mode():
+        model(x)
+        started = time.perf_counter()
+        for _ in range(repeats):
+            model(x)
+    return (time.perf_counter() - started) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS))
+    args = parser.parse_args()
+
+    configure_threads(args.threads)
+    reference = random_generator()
+    results = {}
+    for name in args.configs:
+        options = CONFIGS[name]
+        model = reference
+        if options is not None:
+            model = optimize_model(copy.deepcopy(reference), example_input=torch.rand(1, 3, 64, 64), **options)
+
+        per_size = {}
+        for size in args.sizes:
+            x = torch.rand(1, 3, size, size)
+            with torch.inference_mode():
+                max_abs_diff = (model(x) - reference(x)).abs().max().item()
+            per_size[size] = {
+                "latency_sec": measure(model, x, args.repeats),
+                "max_abs_diff": max_abs_diff,
+            }
+        results[name] = per_size
+
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
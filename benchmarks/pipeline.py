@@ -0,0 +1,83 @@
+"""
+Микробенчмарк стадий предобработки и постобработки. Предобработка -
+Transforms.to_tensor (albumentations), постобработка - прежняя реализация
+на numpy против Transforms.to_uint8.
+
+Запуск: python -m benchmarks.pipeline --sizes 128 256 512 --repeats 20
+Для каждой стадии выводится средняя задержка и объем выделенной памяти
+(пик tracemalloc для numpy и суммарные выделения профайлера PyTorch).
+"""
+import argparse
+import json
+import time
+import tracemalloc
+import numpy as np
+import torch
+from torch.profiler import profile, ProfilerActivity
+
+from transform.transform import Transforms
+
+
+def legacy_postprocessing(SR_image: torch.Tensor) -> np.ndarray:
+    SR_image = SR_image.squeeze(0).permute(1, 2, 0).cpu().numpy()
+    SR_image = np.clip(SR_image, -1, 1)
+    SR_image = SR_image * 0.5 + 0.5
+    SR_image = np.clip(SR_image, 0, 1)
+    return (SR_image * 255).astype(np.uint8)
+
+
+def measure(func, make_input, repeats: int) -> dict:
+    func(make_input())
+
+    elapsed = 0.0
+    for _ in range(repeats):
+        value = make_input()
+        started = time.perf_counter()
+        func(value)
+        elapsed += time.perf_counter() - started
+
+    value = make_input()
+    tracemalloc.start()
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+        func(value)
+    _, numpy_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    torch_allocated = sum(max(event.cpu_memory_usage, 0) for event in prof.events())
+
+    return {
+        "latency_sec": elapsed / repeats,
+        "numpy_peak_bytes": numpy_peak,
+        "torch_allocated_bytes": torch_allocated,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[128, 256, 512])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--scale", type=int, default=4)
+    args = parser.parse_args()
+
+    transform = Transforms()
+    rng = np.random.default_rng(0)
+    results = {}
+    for size in args.sizes:
+        img_array = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        out_size = size * args.scale
+
+        def make_output():
+            return torch.rand(1, 3, out_size, out_size) * 2 - 1
+
+        results[size] = {
+            "preprocessing": measure(transform.to_tensor, lambda: img_array, args.repeats),
+            "postprocessing": {
+                "legacy": measure(legacy_postprocessing, make_output, args.repeats),
+                "lean": measure(transform.to_uint8, make_output, args.repeats),
+            },
+        }
+
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
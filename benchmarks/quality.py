@@ -0,0 +1,343 @@
+"""
+Регрессия качества оптимизированных путей инференса относительно эталона fp32.
+
+Фиксированный набор изображений прогоняется через эталонный Generator (fp32,
+без оптимизаций, целиком) и через каждый оптимизированный путь. Для каждого
+пути считаются PSNR, SSIM и максимальное отклонение пикселя (uint8, как в
+ответе сервиса) относительно эталона, а также задержка. Если качество ниже
+порога, скрипт завершается с кодом 1.
+
+Работает офлайн на CPU. Без --checkpoint используется фикстурная модель
+benchmarks/fixtures/generator_fixture.pt (хранится в репозитории, --write-fixture
+пересоздает ее из генератора с фиксированным seed).
+
+Запуск: python -m benchmarks.quality --output quality.json
+Пороги по путям переопределяются JSON-файлом:
+    {"int8": {"min_psnr": 30.0, "min_ssim": 0.95, "max_deviation": 64}}
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from PIL import Image
+
+from model.registry import ModelSpec
+from model.checkpoint import extract_generator_weights, load_generator_weights
+from model.optimize import optimize_model, configure_threads
+from model.quantization import BF16Model, bf16_supported, calibration_samples, quantize_int8
+from model.tiling import tiled_forward_uint8
+from transform.transform import Transforms
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "generator_fixture.pt")
+FIXTURE_SPEC = {"name": "fixture", "scale": 4, "num_blocks": 2, "num_channels": 16}
+
+# Пороги по умолчанию: эквивалентные преобразования - почти точное совпадение,
+# пониженная точность и тайлы - допустимая потеря качества
+STRICT = {"min_psnr": 45.0, "min_ssim": 0.995, "max_deviation": 4}
+DEFAULT_THRESHOLDS = {
+    "fold_bn": STRICT,
+    "channels_last": STRICT,
+    "trace": STRICT,
+    "compile": STRICT,
+    "onnx": STRICT,
+    "tiled": {"min_psnr": 35.0, "min_ssim": 0.98, "max_deviation": 32},
+    "bf16": {"min_psnr": 32.0, "min_ssim": 0.95, "max_deviation": 48},
+    # Откалиброваны по фикстуре (PSNR 42.5, SSIM 0.96, отклонение 8) с запасом
+    "int8": {"min_psnr": 40.0, "min_ssim": 0.94, "max_deviation": 12},
+}
+DEFAULT_PATHS = ["fold_bn", "channels_last", "trace", "tiled", "int8", "bf16", "onnx"]
+
+
+class SkipPath(Exception):
+    """Путь недоступен в текущем окружении"""
+
+
+class Tiled(nn.Module):
+    """Эталонная модель с тайловым инференсом, как в сервисе"""
+
+    def __init__(self, model, tile_size: int, overlap: int):
+        super().__init__()
+        self.model = model
+        self.tile_size = tile_size
+        self.overlap = overlap
+
+    def forward(self, x):
+        return tiled_forward_uint8(self.model, x, self.tile_size, self.overlap)
+
+
+def fixture_generator(seed: int = 0) -> nn.Module:
+    """Небольшой генератор с фиксированными весами и неединичной статистикой BatchNorm"""
+    torch.manual_seed(seed)
+    model = ModelSpec(**FIXTURE_SPEC).build()
+    for module in model.modules():
+        if isinstance(module, nn.BatchNorm2d):
+            module.running_mean.uniform_(-0.1, 0.1)
+            module.running_var.uniform_(0.5, 1.5)
+            module.weight.data.uniform_(0.5, 1.5)
+            module.bias.data.uniform_(-0.1, 0.1)
+    return model.eval()
+
+
+def load_reference(checkpoint: str, args) -> tuple:
+    """Эталонный генератор: реальный чекпоинт, сохраненная фикстура или фикстура из seed"""
+    if checkpoint:
+        spec = ModelSpec("checkpoint", scale=args.scale, path=checkpoint)
+        if checkpoint.endswith(".pth"):
+            with tempfile.TemporaryDirectory() as workdir:
+                state_dict = extract_generator_weights(checkpoint, os.path.join(workdir, "weights.pt"))
+        else:
+            state_dict = load_generator_weights(checkpoint)
+        model = spec.build()
+        model.load_state_dict(state_dict)
+        return model.eval(), checkpoint
+
+    if os.path.exists(FIXTURE_PATH) and not args.write_fixture:
+        model = ModelSpec(**FIXTURE_SPEC).build()
+        model.load_state_dict(torch.load(FIXTURE_PATH, map_location="cpu", weights_only=True))
+        return model.eval(), FIXTURE_PATH
+
+    model = fixture_generator(args.seed)
+    if args.write_fixture:
+        os.makedirs(os.path.dirname(FIXTURE_PATH), exist_ok=True)
+        torch.save(model.state_dict(), FIXTURE_PATH)
+        return model, FIXTURE_PATH
+    return model, f"seed:{args.seed}"
+
+
+def load_photos(images_dir: str, count: int, size: int) -> list:
+    """Центральные фрагменты size x size первых count изображений каталога"""
+    photos = []
+    for name in sorted(os.listdir(images_dir)):
+        if len(photos) >= count:
+            break
+        try:
+            img = Image.open(os.path.join(images_dir, name)).convert("RGB")
+        except Exception:
+            continue
+        width, height = img.size
+        side = min(size, width, height)
+        left, top = (width - side) // 2, (height - side) // 2
+        crop = np.asarray(img.crop((left, top, left + side, top + side)), dtype=np.float32) / 255.0
+        photos.append(torch.from_numpy(crop).permute(2, 0, 1).unsqueeze(0).contiguous())
+    return photos
+
+
+def test_images(size: int, seed: int, images_dir: str = "") -> dict:
+    """
+    Фиксированный набор входов 1x3xHxW в [0, 1]: синтетические сюжеты и (опционально) фото.
+    Заданный, но отсутствующий или пустой каталог фото - ошибка, а не подмена шумом.
+    """
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32) / (size - 1)
+    radius = np.sqrt((x - 0.5) ** 2 + (y - 0.5) ** 2)
+    rng = np.random.default_rng(seed)
+    images = {
+        "gradient": np.stack([x, y, (x + y) / 2]),
+        "checkerboard": np.repeat(((np.floor(x * 8) + np.floor(y * 8)) % 2)[None], 3, axis=0),
+        "rings": np.repeat((0.5 + 0.5 * np.sin(radius * 40))[None], 3, axis=0),
+        "noise": rng.random((3, size, size), dtype=np.float32),
+        "edges": np.stack([(x > 0.3) * 0.9, (y > 0.6) * 0.7, (radius < 0.25) * 0.8]),
+    }
+    result = {name: torch.from_numpy(np.ascontiguousarray(image, dtype=np.float32))[None] for name, image in images.items()}
+    if images_dir:
+        if not os.path.isdir(images_dir):
+            raise ValueError(f"Каталог с фото не найден: {images_dir}")
+        photos = load_photos(images_dir, count=8, size=size)
+        if not photos:
+            raise ValueError(f"В каталоге {images_dir} нет изображений")
+        for index, sample in enumerate(photos):
+            result[f"photo_{index}"] = sample
+    return result
+
+
+def build_path(name: str, reference: nn.Module, samples: list, args):
+    """Оптимизированный вариант эталона теми же средствами, что и в сервисе"""
+    example = samples[0]
+    if name == "fold_bn":
+        return optimize_model(copy.deepcopy(reference), fold_bn=True)
+    if name == "channels_last":
+        return optimize_model(copy.deepcopy(reference), fold_bn=True, channels_last=True)
+    if name in ("trace", "compile"):
+        return optimize_model(copy.deepcopy(reference), fold_bn=True, jit=name, example_input=example)
+    if name == "tiled":
+        return Tiled(reference, args.tile_size, args.tile_overlap)
+    if name == "int8":
+        # Калибровка как в сервисе и на других входах, чем оценка
+        calibration = calibration_samples(args.calibration, count=8, size=args.size)
+        return quantize_int8(optimize_model(copy.deepcopy(reference), fold_bn=True), calibration)
+    if name == "bf16":
+        if not bf16_supported():
+            raise SkipPath("CPU не поддерживает bf16")
+        return BF16Model(optimize_model(copy.deepcopy(reference), fold_bn=True))
+    if name == "onnx":
+        try:
+            from model.backends import OnnxBackend, export_onnx
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            raise SkipPath("onnxruntime не установлен")
+        onnx_path = os.path.join(args.workdir, "quality.onnx")
+        export_onnx(optimize_model(copy.deepcopy(reference), fold_bn=True), onnx_path)
+        return OnnxBackend(onnx_path, args.threads)
+    raise ValueError(f"Неизвестный путь: {name}")
+
+
+def _gaussian_window(size: int = 11, sigma: float = 1.5) -> torch.Tensor:
+    coords = torch.arange(size, dtype=torch.float64) - (size - 1) / 2
+    kernel = torch.exp(-coords ** 2 / (2 * sigma ** 2))
+    kernel = kernel / kernel.sum()
+    return (kernel[:, None] * kernel[None, :]).expand(3, 1, size, size).contiguous()
+
+
+def ssim(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """SSIM двух HWC uint8 изображений (гауссово окно 11, sigma 1.5, среднее по каналам)"""
+    a = torch.from_numpy(reference).permute(2, 0, 1)[None].double()
+    b = torch.from_numpy(candidate).permute(2, 0, 1)[None].double()
+    window = _gaussian_window()
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def blur(t):
+        return F.conv2d(t, window, groups=3)
+
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a ** 2
+    var_b = blur(b * b) - mu_b ** 2
+    cov = blur(a * b) - mu_a * mu_b
+    ssim_map = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(ssim_map.mean())
+
+
+def psnr(reference: np.ndarray, candidate: np.ndarray) -> float:
+    mse = np.mean((reference.astype(np.float64) - candidate.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else float(10.0 * np.log10(255.0 ** 2 / mse))
+
+
+def run(model, x: torch.Tensor, transforms: Transforms, repeats: int) -> tuple:
+    """Выход пути в uint8 HWC (как в ответе сервиса) и средняя задержка"""
+    with torch.inference_mode():
+        model(x)
+        started = time.perf_counter()
+        for _ in range(repeats):
+            output = model(x)
+        latency = (time.perf_counter() - started) / repeats
+        if output.dtype == torch.uint8:
+            # Тайловый путь сразу возвращает HWC uint8
+            return output.numpy(), latency
+        return transforms.to_uint8(output.float()), latency
+
+
+def evaluate(name: str, model, reference_outputs: dict, images: dict, transforms: Transforms,
+             thresholds: dict, repeats: int) -> dict:
+    per_image = {}
+    for image_name, x in images.items():
+        output, latency = run(model, x, transforms, repeats)
+        expected, reference_latency = reference_outputs[image_name]
+        per_image[image_name] = {
+            "psnr_db": psnr(expected, output),
+            "ssim": ssim(expected, output),
+            "max_deviation": int(np.abs(expected.astype(np.int16) - output.astype(np.int16)).max()),
+            "latency_sec": latency,
+            "speedup": reference_latency / latency if latency else 0.0,
+        }
+
+    worst = {
+        "psnr_db": min(item["psnr_db"] for item in per_image.values()),
+        "ssim": min(item["ssim"] for item in per_image.values()),
+        "max_deviation": max(item["max_deviation"] for item in per_image.values()),
+        "latency_sec": float(np.mean([item["latency_sec"] for item in per_image.values()])),
+        "speedup": float(np.mean([item["speedup"] for item in per_image.values()])),
+    }
+    limits = thresholds.get(name, STRICT)
+    failures = []
+    if worst["psnr_db"] < limits["min_psnr"]:
+        failures.append(f"PSNR {worst['psnr_db']:.2f} < {limits['min_psnr']}")
+    if worst["ssim"] < limits["min_ssim"]:
+        failures.append(f"SSIM {worst['ssim']:.4f} < {limits['min_ssim']}")
+    if worst["max_deviation"] > limits["max_deviation"]:
+        failures.append(f"max deviation {worst['max_deviation']} > {limits['max_deviation']}")
+    return {
+        "status": "fail" if failures else "pass",
+        "failures": failures,
+        "thresholds": limits,
+        "worst": worst,
+        "images": per_image,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkpoint", default="", help="чекпоинт .pth или weights.pt (по умолчанию фикстура)")
+    parser.add_argument("--scale", type=int, default=4)
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS, choices=list(DEFAULT_THRESHOLDS))
+    parser.add_argument("--size", type=int, default=96, help="сторона тестовых изображений")
+    parser.add_argument("--images", default="", help="каталог с дополнительными фото")
+    parser.add_argument("--calibration", default="", help="каталог калибровки int8 (по умолчанию шум, как в сервисе)")
+    parser.add_argument("--tile-size", type=int, default=64)
+    parser.add_argument("--tile-overlap", type=int, default=16)
+    parser.add_argument("--thresholds", default="", help="JSON-файл с порогами по путям")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write-fixture", action="store_true")
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    configure_threads(args.threads)
+    thresholds = {name: dict(limits) for name, limits in DEFAULT_THRESHOLDS.items()}
+    if args.thresholds:
+        with open(args.thresholds, "r", encoding="utf-8") as f:
+            for name, limits in json.load(f).items():
+                thresholds.setdefault(name, dict(STRICT)).update(limits)
+
+    reference, source = load_reference(args.checkpoint, args)
+    try:
+        images = test_images(args.size, args.seed, args.images)
+    except ValueError as e:
+        parser.error(str(e))
+    transforms = Transforms()
+    reference_outputs = {name: run(reference, x, transforms, args.repeats) for name, x in images.items()}
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        for name in args.paths:
+            try:
+                model = build_path(name, reference, list(images.values()), args)
+            except SkipPath as e:
+                results[name] = {"status": "skipped", "reason": str(e)}
+                continue
+            results[name] = evaluate(name, model, reference_outputs, images, transforms, thresholds, args.repeats)
+        del args.workdir
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "torch_threads": torch.get_num_threads(),
+        },
+        "model": source,
+        "args": vars(args),
+        "reference_latency_sec": float(np.mean([latency for _, latency in reference_outputs.values()])),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+    failed = [name for name, result in results.items() if result["status"] == "fail"]
+    if failed:
+        print(f"Качество ниже порога: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
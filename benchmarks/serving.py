@@ -0,0 +1,158 @@
+"""
+Воспроизводимый бенчмарк генератора и пути обслуживания /upscale на CPU.
+
+Используются случайные веса, поэтому чекпоинт не скачивается. Измеряются:
+    generator  - задержка прямого прохода модели (без тайлов и преобразований)
+                 по размерам входа и размерам батча;
+    end_to_end - задержка /upscale внутри процесса (FastAPI + httpx ASGI);
+    throughput - пропускная способность /upscale при разной конкурентности.
+
+Запуск: python -m benchmarks.serving --output bench.json
+Конфигурация сервиса (SRGAN_*) берется из переменных окружения, как в docker-compose.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import numpy as np
+import torch
+from PIL import Image
+
+# Кэш результатов исказил бы измерения повторяющихся запросов
+os.environ["SRGAN_CACHE_MEMORY_MB"] = "0"
+os.environ["SRGAN_CACHE_DIR"] = ""
+
+from app import FastAPIApp
+from model.registry import LoadedModel
+
+
+def _summary(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "mean_sec": statistics.fmean(ordered),
+        "p50_sec": ordered[len(ordered) // 2],
+        "p95_sec": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "min_sec": ordered[0],
+        "runs": len(ordered),
+    }
+
+
+def _png(rng: np.random.Generator, size: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_app(workdir: str) -> FastAPIApp:
+    """FastAPIApp с моделью по умолчанию на случайных весах вместо чекпоинта"""
+    torch.manual_seed(0)
+    app = FastAPIApp()
+    srgan = app.srgan
+    spec = srgan.registry.default_spec
+    spec.path = os.path.join(workdir, "random_generator.pth")
+    model = spec.build().eval()
+    size_bytes = sum(t.numel() * t.element_size() for t in model.state_dict().values())
+    srgan.registry.loaded[spec.name] = LoadedModel(spec, srgan.prepare_model(model, spec), size_bytes)
+    srgan.ready = True
+    app.ready = True
+    return app
+
+
+def bench_generator(app: FastAPIApp, sizes: list, batch_sizes: list, repeats: int) -> dict:
+    """Чистый прямой проход бэкенда модели: без тайлов, пред- и постобработки"""
+    backend = app.srgan.model
+    results = {}
+    with torch.no_grad():
+        for size in sizes:
+            for batch in batch_sizes:
+                x = torch.rand(batch, 3, size, size)
+                backend(x)
+                samples = []
+                for _ in range(repeats):
+                    started = time.perf_counter()
+                    backend(x)
+                    samples.append(time.perf_counter() - started)
+                results[f"{size}x{size}/b{batch}"] = dict(_summary(samples), images_per_sec=batch / statistics.fmean(samples))
+    return results
+
+
+async def _post(client, image: bytes) -> float:
+    started = time.perf_counter()
+    response = await client.post(
+        "/upscale",
+        files={"file": ("bench.png", image, "image/png")},
+        data={"response_format": "binary"},
+    )
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def bench_serving(app: FastAPIApp, size: int, repeats: int, concurrency: list, seed: int) -> tuple:
+    import httpx
+
+    rng = np.random.default_rng(seed)
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await _post(client, _png(rng, size))
+        end_to_end = _summary([await _post(client, _png(rng, size)) for _ in range(repeats)])
+
+        throughput = {}
+        for level in concurrency:
+            images = [_png(rng, size) for _ in range(level * repeats)]
+            started = time.perf_counter()
+            latencies = []
+            for offset in range(0, len(images), level):
+                latencies += await asyncio.gather(*[_post(client, image) for image in images[offset:offset + level]])
+            elapsed = time.perf_counter() - started
+            throughput[level] = dict(_summary(latencies), requests_per_sec=len(images) / elapsed)
+    return end_to_end, throughput
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--serving-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = build_app(workdir)
+        generator = bench_generator(app, args.sizes, args.batch_sizes, args.repeats)
+        end_to_end, throughput = asyncio.run(
+            bench_serving(app, args.serving_size, args.repeats, args.concurrency, args.seed)
+        )
+        app.srgan.pool.shutdown()
+        app.srgan.fallback_pool.shutdown()
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "config": {key: value for key, value in sorted(os.environ.items()) if key.startswith("SRGAN_")},
+        },
+        "args": vars(args),
+        "generator": generator,
+        "end_to_end": end_to_end,
+        "throughput": throughput,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
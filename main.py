@@ -6,6 +6,7 @@ from utils.server_logger import ServerLogger
 import uvicorn
 import signal
 import sys
+import time
 
 class NGROKServer:
     def __init__(self):
@@ -24,9 +25,10 @@ class NGROKServer:
     async def init_app(self):
         """Асинхронная инициализация приложения"""
         self.logger.info("Инициализация приложения...")
+        started = time.perf_counter()
         self.app = FastAPIApp()
         await self.app.load_model()
-        self.logger.info("Приложение инициализировано успешно")
+        self.logger.info(f"Приложение инициализировано успешно за {time.perf_counter() - started:.2f} с")
         return self.app
 
     async def start_ngrok_tunnel(self):
@@ -0,0 +1,68 @@
+import os
+import torch
+
+BACKENDS = ("torch", "onnx")
+
+
+class TorchBackend:
+    """Инференс через модуль PyTorch"""
+
+    name = "torch"
+
+    def __init__(self, model, precision: str = "fp32"):
+        self.model = model
+        self.precision = precision
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        return self.model(x)
+
+
+class OnnxBackend:
+    """Инференс через ONNX Runtime (CPU)"""
+
+    name = "onnx"
+    precision = "fp32"
+
+    def __init__(self, onnx_path: str, num_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.onnx_path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        inputs = {self.input_name: x.detach().cpu().contiguous().numpy()}
+        return torch.from_numpy(self.session.run(None, inputs)[0])
+
+
+def export_onnx(model, onnx_path: str, opset_version: int = 17):
+    """Экспорт генератора в ONNX с динамическими batch/height/width (атомарная запись)"""
+    example = torch.rand(1, 3, 64, 64)
+    tmp_path = f"{onnx_path}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            example,
+            tmp_path,
+            input_names=["input"],
+            output_names=["output"],
+            dynamic_axes={
+                "input": {0: "batch", 2: "height", 3: "width"},
+                "output": {0: "batch", 2: "height", 3: "width"},
+            },
+            opset_version=opset_version,
+        )
+    os.replace(tmp_path, onnx_path)
+
+
+def parity_error(reference, backend, size: int = 48) -> float:
+    """Максимальное расхождение выходов backend и эталонной модели на случайном входе"""
+    x = torch.rand(1, 3, size, size, generator=torch.Generator().manual_seed(0))
+    with torch.no_grad():
+        expected = reference(x)
+        actual = backend(x)
+    return (expected - actual).abs().max().item()
@@ -0,0 +1,128 @@
+import asyncio
+import math
+import torch
+import torch.nn.functional as F
+from .deadline import Deadline, RequestCancelled
+
+
+def collate(tensors: list, size: tuple) -> torch.Tensor:
+    """Дополнение тензоров до общего размера (replicate) и объединение в батч"""
+    height, width = size
+    padded = []
+    for x in tensors:
+        h, w = x.shape[-2:]
+        if (h, w) != (height, width):
+            x = F.pad(x, (0, width - w, 0, height - h), mode="replicate")
+        padded.append(x)
+    return torch.cat(padded, dim=0)
+
+
+class BatchScheduler:
+    """
+    Динамический микробатчинг запросов к генератору.
+
+    Запросы, пришедшие в пределах окна max_wait_ms, группируются в корзины
+    одинаковой формы и обрабатываются одним батчевым проходом, после чего
+    результаты раздаются ожидающим запросам.
+
+    Политики корзин:
+        exact - в батч попадают только изображения одинакового размера;
+        pad   - размеры округляются вверх до кратного pad_multiple, вход
+                дополняется replicate-паддингом, выход обрезается обратно.
+    """
+
+    def __init__(self, run_batch, max_batch_size: int = 4, max_wait_ms: float = 10.0,
+                 bucket_policy: str = "pad", pad_multiple: int = 64):
+        if bucket_policy not in ("exact", "pad"):
+            raise ValueError(f"Неизвестная политика корзин: {bucket_policy}")
+        # run_batch(tensors, size, group, admissions) -> awaitable с выходом генератора для батча
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.bucket_policy = bucket_policy
+        self.pad_multiple = max(1, pad_multiple)
+
+        self.pending = {}
+        self.timers = {}
+
+        # Счетчики для мониторинга
+        self.batches = 0
+        self.items = 0
+        self.skipped = 0
+
+    def bucket_key(self, height: int, width: int) -> tuple:
+        if self.bucket_policy == "pad":
+            m = self.pad_multiple
+            return (math.ceil(height / m) * m, math.ceil(width / m) * m)
+        return (height, width)
+
+    async def submit(self, x: torch.Tensor, group=None, deadline: Deadline = None, admission=None) -> torch.Tensor:
+        """
+        Постановка тензора (1, C, H, W) в очередь батчинга, возвращает выход генератора.
+        В один батч попадают только запросы с одинаковым group (например, именем модели).
+        Запрос, срок которого истек за время ожидания батча, в батч не попадает.
+        admission - место запроса в очереди пула, передается в run_batch для учета.
+        """
+        loop = asyncio.get_running_loop()
+        height, width = x.shape[-2:]
+        key = (group,) + self.bucket_key(height, width)
+        future = loop.create_future()
+
+        bucket = self.pending.setdefault(key, [])
+        bucket.append((x, height, width, future, deadline, admission))
+        if len(bucket) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self.timers:
+            self.timers[key] = loop.call_later(self.max_wait, self._flush, key)
+
+        return await future
+
+    def _flush(self, key: tuple):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = self.pending.pop(key, None)
+        if items:
+            asyncio.ensure_future(self._run(key, items))
+
+    async def _run(self, key: tuple, items: list):
+        # Запросы, отмененные или просроченные за время ожидания батча, не обрабатываются
+        items = [item for item in items if not item[3].done() and not self._expired(item)]
+        if not items:
+            return
+        self.batches += 1
+        self.items += len(items)
+        try:
+            group, size = key[0], key[1:]
+            admissions = [item[5] for item in items if item[5] is not None]
+            output = await self.run_batch([item[0] for item in items], size, group, admissions)
+            scale = output.shape[-1] // size[1]
+            for i, (_, height, width, future, _, _) in enumerate(items):
+                if not future.done():
+                    future.set_result(output[i:i + 1, :, :height * scale, :width * scale])
+        except Exception as e:
+            for _, _, _, future, _, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _expired(self, item: tuple) -> bool:
+        future, deadline = item[3], item[4]
+        reason = deadline.reason() if deadline is not None else None
+        if reason is None:
+            return False
+        deadline.record("batch")
+        self.skipped += 1
+        future.set_exception(RequestCancelled(reason))
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "bucket_policy": self.bucket_policy,
+            "batches": self.batches,
+            "items": self.items,
+            "skipped": self.skipped,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "pending": sum(len(items) for items in self.pending.values()),
+        }
@@ -0,0 +1,39 @@
+import os
+import torch
+
+
+def extract_generator_weights(checkpoint_path: str, weights_path: str) -> dict:
+    """
+    Извлечение generator_state_dict из полного обучающего чекпоинта
+    (генератор, дискриминатор, оптимизаторы) в компактный файл только с весами.
+    """
+    checkpoint = torch.load(checkpoint_path, map_location="cpu", weights_only=False)
+    state_dict = checkpoint["generator_state_dict"]
+    del checkpoint
+
+    tmp_path = f"{weights_path}.tmp"
+    torch.save(state_dict, tmp_path)
+    os.replace(tmp_path, weights_path)
+    return state_dict
+
+
+def load_generator_weights(weights_path: str) -> dict:
+    """Загрузка компактного файла весов с отображением в память (без копирования в RAM)"""
+    return torch.load(weights_path, map_location="cpu", weights_only=True, mmap=True)
+
+
+def parse_shapes(value: str) -> list:
+    """Разбор списка размеров вида '64x64,128x96' в [(64, 64), (128, 96)] (ValueError при ошибке)"""
+    shapes = []
+    for item in value.split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        try:
+            height, width = (int(side) for side in item.split("x"))
+        except ValueError:
+            raise ValueError(f"Некорректный размер прогрева: {item!r}, ожидается ВЫСОТАxШИРИНА") from None
+        if height <= 0 or width <= 0:
+            raise ValueError(f"Размер прогрева должен быть положительным: {item!r}")
+        shapes.append((height, width))
+    return shapes
@@ -0,0 +1,62 @@
+import time
+from typing import Optional
+from utils.metrics import METRICS
+
+EXPIRED = "expired"
+DISCONNECTED = "disconnected"
+
+
+class RequestCancelled(RuntimeError):
+    """Запрос отменен: истек срок или клиент отключился"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Запрос отменен: {reason}")
+        self.reason = reason
+
+
+class Deadline:
+    """
+    Срок выполнения запроса и флаг отмены.
+
+    Проверяется в безопасных точках обработки (перед началом работы в пуле,
+    между тайлами, перед кодированием), в том числе из потоков пула.
+    """
+
+    def __init__(self, timeout_sec: float = 0.0):
+        self.expires_at = time.monotonic() + timeout_sec if timeout_sec > 0 else None
+        self.cancelled = None
+        self.recorded = False
+
+    def cancel(self, reason: str = DISCONNECTED):
+        if self.cancelled is None:
+            self.cancelled = reason
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def reason(self) -> Optional[str]:
+        if self.cancelled is not None:
+            return self.cancelled
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            return EXPIRED
+        return None
+
+    def record(self, stage: str):
+        """Однократный учет отмененной работы в метриках"""
+        if not self.recorded:
+            self.recorded = True
+            METRICS.cancelled.inc(reason=self.reason() or DISCONNECTED, stage=stage)
+
+    def check(self, stage: str):
+        """Безопасная точка: прерывает обработку, если запрос больше не нужен"""
+        reason = self.reason()
+        if reason is not None:
+            self.record(stage)
+            raise RequestCancelled(reason)
+
+
+def checkpoint(deadline: Optional[Deadline], stage: str):
+    if deadline is not None:
+        deadline.check(stage)
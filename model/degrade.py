@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# Упрощенный апскейлер без нейросети
+BICUBIC = "bicubic"
+
+
+class DegradePolicy:
+    """
+    Политика деградации качества под нагрузкой.
+
+    Если оценка времени ответа превышает цель или оставшийся срок запроса,
+    очередь инференса глубже порога или переполнена, запрос обслуживается
+    упрощенно: бикубической интерполяцией либо более легкой моделью из реестра
+    (fallback - имя ее уровня качества).
+    """
+
+    def __init__(self, fallback: str = "off", latency_target_ms: float = 0.0, queue_depth: int = 0):
+        self.fallback = fallback
+        self.latency_target = latency_target_ms / 1000.0
+        self.queue_depth = queue_depth
+
+        # Счетчики срабатываний по причинам
+        self.triggered = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.fallback != "off"
+
+    def reason(self, estimated_latency: float, queued: int, remaining: Optional[float] = None) -> Optional[str]:
+        """Причина деградации для нового запроса либо None (remaining - остаток срока запроса)"""
+        if not self.enabled:
+            return None
+        if remaining is not None and estimated_latency > remaining:
+            return "deadline"
+        if self.latency_target > 0 and estimated_latency > self.latency_target:
+            return "latency"
+        if self.queue_depth > 0 and queued >= self.queue_depth:
+            return "queue_depth"
+        return None
+
+    def record(self, reason: str):
+        self.triggered[reason] = self.triggered.get(reason, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "fallback": self.fallback,
+            "latency_target_ms": self.latency_target * 1000.0,
+            "queue_depth": self.queue_depth,
+            "triggered": dict(self.triggered),
+        }
+
+
+class LatencyEstimator:
+    """
+    Оценка времени ответа по недавним замерам обслуживания.
+
+    Хранятся время обслуживания запроса (без ожидания в очереди) и число
+    пикселей его входа за последние window_sec секунд; для нового запроса
+    время на пиксель масштабируется по его размеру. Без свежих замеров оценка
+    нулевая: после всплеска нагрузки деградация выключается, и следующий
+    полный проход дает новый замер.
+    """
+
+    def __init__(self, window_sec: float = 60.0, max_samples: int = 64):
+        self.window = window_sec
+        self.samples = deque(maxlen=max(1, max_samples))
+        self.clock = time.monotonic
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, pixels: int):
+        if pixels <= 0:
+            return
+        with self._lock:
+            self.samples.append((self.clock(), seconds, pixels))
+
+    def _recent(self) -> list:
+        with self._lock:
+            horizon = self.clock() - self.window
+            while self.samples and self.samples[0][0] < horizon:
+                self.samples.popleft()
+            return list(self.samples)
+
+    def service_time(self, pixels: Optional[int] = None) -> float:
+        """Время обслуживания входа из pixels пикселей (None - среднего запроса), 0 без замеров"""
+        samples = self._recent()
+        if not samples:
+            return 0.0
+        if pixels is None:
+            return sum(seconds for _, seconds, _ in samples) / len(samples)
+        per_pixel = sum(seconds for _, seconds, _ in samples) / sum(count for _, _, count in samples)
+        return per_pixel * pixels
+
+    def estimate(self, pixels: int, ahead: int, workers: int) -> float:
+        """Ответ нового запроса: его обслуживание плюс ahead средних запросов на workers исполнителях"""
+        return self.service_time(pixels) + self.service_time() * (ahead // max(1, workers))
+
+    def stats(self) -> dict:
+        samples = self._recent()
+        return {
+            "samples": len(samples),
+            "window_sec": self.window,
+            "avg_service_sec": self.service_time(),
+        }
@@ -69,7 +69,7 @@ class UpsamplingBlock(nn.Module):  #Conv -> PixelShuffle -> PReLU
   
 
 class Generator(nn.Module):
-  def __init__(self, in_channels=3, num_channels=64, num_blocks=16, scale = 2):
+  def __init__(self, in_channels=3, num_channels=64, num_blocks=16, scale = 2, num_upsampling = 2):
     super().__init__()
     self.initial = GenBlock(
         in_channels,
@@ -91,9 +91,9 @@ class Generator(nn.Module):
         use_act= False
     )
 
+    # Итоговое увеличение: scale ** num_upsampling
     self.upsampling_blocks = nn.Sequential(
-        UpsamplingBlock(num_channels, scale),
-        UpsamplingBlock(num_channels, scale)
+        *[UpsamplingBlock(num_channels, scale) for _ in range(num_upsampling)]
     )
 
     self.final = nn.Conv2d(num_channels, in_channels, kernel_size=9, stride=1, padding=4)
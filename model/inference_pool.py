@@ -0,0 +1,184 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from .degrade import LatencyEstimator
+
+
+class QueueFullError(RuntimeError):
+    """Очередь инференса переполнена, запрос нужно повторить позже"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Очередь инференса переполнена")
+        self.retry_after = retry_after
+
+
+class Admission:
+    """
+    Место запроса в ограниченной очереди пула.
+
+    Запрос из нескольких этапов (декодирование, инференс, кодирование)
+    допускается один раз и держит место до конца: между этапами его нельзя
+    отклонить после уже выполненной работы. Место освобождается, когда
+    завершились и запрос, и все его задачи в пуле. service - суммарное время
+    выполнения задач запроса без ожидания в очереди.
+    """
+
+    def __init__(self, pool: "InferencePool"):
+        self.pool = pool
+        self.refs = 1
+        self.service = 0.0
+
+    def retain(self):
+        with self.pool._lock:
+            self.refs += 1
+
+    def release(self):
+        with self.pool._lock:
+            self.refs -= 1
+            if self.refs == 0:
+                self.pool.in_flight -= 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class InferencePool:
+    """
+    Выделенный пул потоков для инференса с ограниченной очередью ожидания.
+
+    Тяжелые вычисления выполняются вне цикла событий asyncio, а при переполнении
+    очереди запрос сразу отклоняется с QueueFullError.
+    """
+
+    def __init__(self, workers: int = 1, max_queue: int = 8, latency_window: float = 60.0):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="srgan-infer")
+        self._lock = threading.Lock()
+        # Недавнее время обслуживания запросов для оценки задержки
+        self.latency = LatencyEstimator(latency_window)
+
+        # Счетчики для мониторинга
+        self.in_flight = 0
+        self.running = 0
+        self.started = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_service = 0.0
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.in_flight - self.running)
+
+    def retry_after(self) -> int:
+        """Оценка времени (в секундах), через которое стоит повторить запрос"""
+        avg_service = self.latency.service_time() or 1.0
+        return max(1, int(round(avg_service * (self.queued + 1) / self.workers)))
+
+    def estimated_latency(self, pixels: int) -> float:
+        """Оценка времени ответа нового запроса из pixels пикселей с учетом очереди (секунды)"""
+        return self.latency.estimate(pixels, self.in_flight, self.workers)
+
+    def admit(self) -> Admission:
+        """Допуск запроса в очередь (QueueFullError при переполнении)"""
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                rejected = True
+            else:
+                self.in_flight += 1
+                rejected = False
+        if rejected:
+            raise QueueFullError(self.retry_after())
+        return Admission(self)
+
+    async def run(self, func, *args):
+        """Выполнение func(*args) в пуле с учетом ограничения очереди"""
+        with self.admit() as admission:
+            return await self.run_admitted(admission, func, *args)
+
+    async def run_admitted(self, admission: Admission, func, *args):
+        """
+        Выполнение этапа уже допущенного запроса без повторной проверки очереди.
+
+        Место в очереди освобождается, когда задача действительно завершилась
+        (или снята до старта), а не когда вызывающий перестал ее ожидать:
+        отмененный запрос не должен открывать дорогу новым, пока его работа
+        еще занимает поток пула.
+        """
+        return await self.run_shared([admission], func, *args)
+
+    async def run_shared(self, admissions: List[Admission], func, *args):
+        """
+        Общая работа нескольких допущенных запросов (батчевый проход).
+
+        Задача не занимает отдельного места в очереди и учитывается в
+        счетчиках по изображениям: каждый запрос получает свою долю времени
+        выполнения, чтобы батч не искажал среднее время обслуживания и оценку
+        задержки.
+        """
+        count = max(1, len(admissions))
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self.running += count
+                self.started += count
+                wait = started - submitted
+                self.total_wait += wait * count
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                return func(*args)
+            finally:
+                service = time.perf_counter() - started
+                with self._lock:
+                    self.running -= count
+                    self.completed += count
+                    self.total_service += service
+                    for admission in admissions:
+                        admission.service += service / count
+
+        for admission in admissions:
+            admission.retain()
+        try:
+            future = self.executor.submit(task)
+        except RuntimeError:
+            for admission in admissions:
+                admission.release()
+            raise
+
+        def release(_):
+            for admission in admissions:
+                admission.release()
+
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        """Текущее состояние очереди для операторов"""
+        with self._lock:
+            completed = self.completed
+            started = self.started
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.queued,
+                "completed": completed,
+                "rejected": self.rejected,
+                "avg_wait_sec": self.total_wait / started if started else 0.0,
+                "max_wait_sec": self.max_wait,
+                "avg_service_sec": self.total_service / completed if completed else 0.0,
+                "latency": self.latency.stats(),
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,232 @@
+import asyncio
+import json
+import time
+import urllib.parse
+import urllib.request
+from typing import Optional
+from .inference_pool import QueueFullError
+from utils import image_encoding
+from utils.job_store import JobStore, QUEUED, RUNNING, DONE, FAILED
+from utils.server_logger import ServerLogger
+
+
+class JobLimitError(RuntimeError):
+    """Достигнут лимит числа заданий или места на диске"""
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Перенаправления уведомлений не выполняются: адрес мог бы уйти за пределы списка хостов"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class JobManager:
+    """
+    Асинхронные задания на увеличение изображений.
+
+    Задания сохраняются в JobStore и обрабатываются фоновыми воркерами через
+    SRGANWrapper, поэтому время соединения клиента не зависит от времени расчета.
+    При переполненной очереди инференса задание ждет и повторяется, сглаживая
+    пики нагрузки. Незавершенные задания перезапускаются после рестарта.
+    """
+
+    def __init__(self, srgan, store_dir: str, workers: int = 1, retention_sec: float = 86400.0,
+                 callback_timeout: float = 10.0, max_pending: int = 100, max_disk_bytes: int = 0,
+                 callback_hosts: list = None):
+        self.srgan = srgan
+        self.store_dir = store_dir
+        self.workers = max(1, workers)
+        self.retention_sec = retention_sec
+        self.callback_timeout = callback_timeout
+        # Лимиты: заданий в очереди и в работе (0 - без лимита), объема файлов заданий
+        self.max_pending = max(0, max_pending)
+        self.max_disk_bytes = max(0, max_disk_bytes)
+        # Уведомления отправляются только на эти хосты; пустой список - уведомления отключены
+        self.callback_hosts = {host.lower() for host in (callback_hosts or [])}
+        self._opener = urllib.request.build_opener(_NoRedirect)
+        self.logger = ServerLogger()
+        self.store = None
+        self.queue = None
+        self.tasks = []
+        # Прогресс выполняемых заданий (доля готовых тайлов), в базу пишутся только этапы
+        self.progress = {}
+        self.last_purge = None
+        # Задания в очереди и в работе (для лимита max_pending)
+        self.pending = 0
+
+        # Счетчики для мониторинга
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.callbacks_failed = 0
+
+    @property
+    def started(self) -> bool:
+        return self.store is not None
+
+    async def start(self):
+        """Открытие хранилища, повторная постановка незавершенных заданий и запуск воркеров"""
+        self.store = await asyncio.to_thread(JobStore, self.store_dir)
+        self.queue = asyncio.Queue()
+        pending = await asyncio.to_thread(self.store.unfinished)
+        for job_id in pending:
+            self.queue.put_nowait(job_id)
+        self.pending = len(pending)
+        if pending:
+            self.logger.info("Задания восстановлены после перезапуска", count=len(pending))
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        await self._purge()
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def check_callback(self, callback_url: str):
+        """Проверка адреса уведомления по списку разрешенных хостов (ValueError, если нельзя)"""
+        if not self.callback_hosts:
+            raise ValueError("Уведомления о завершении заданий отключены")
+        parsed = urllib.parse.urlsplit(callback_url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError("callback_url должен быть HTTP(S) URL")
+        if parsed.hostname.lower() not in self.callback_hosts:
+            raise ValueError(f"Хост {parsed.hostname} не разрешен для уведомлений")
+
+    async def submit(self, image_data: bytes, scale_factor: int, options: dict, tier: str,
+                     callback_url: Optional[str] = None) -> dict:
+        if self.max_pending and self.pending >= self.max_pending:
+            self.rejected += 1
+            raise JobLimitError(f"Слишком много заданий в очереди (максимум {self.max_pending})")
+        if self.max_disk_bytes and self.store.disk_used + len(image_data) > self.max_disk_bytes:
+            self.rejected += 1
+            raise JobLimitError("Хранилище заданий заполнено")
+        params = {"scale_factor": scale_factor, "options": options, "tier": tier}
+        self.pending += 1
+        try:
+            job = await asyncio.to_thread(self.store.create, image_data, params, callback_url)
+        except BaseException:
+            self.pending -= 1
+            raise
+        self.queue.put_nowait(job["id"])
+        return self.describe(job)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def result(self, job_id: str) -> bytes:
+        return await asyncio.to_thread(self.store.read_result, job_id)
+
+    def describe(self, job: dict) -> dict:
+        """Публичное представление задания для API"""
+        progress = self.progress.get(job["id"], job["progress"])
+        info = {
+            "id": job["id"],
+            "status": job["status"],
+            "progress": round(progress, 3),
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        }
+        if job["status"] == FAILED:
+            info["error"] = job["error"]
+        if job["status"] == DONE:
+            info["media_type"] = job["media_type"]
+        return info
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.log_error(e, "job_worker")
+            finally:
+                self.progress.pop(job_id, None)
+                self.pending -= 1
+                self.queue.task_done()
+            await self._purge()
+
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["status"] not in (QUEUED, RUNNING):
+            return
+        params = job["params"]
+        await asyncio.to_thread(self.store.update, job_id, status=RUNNING, progress=0.0)
+        self.progress[job_id] = 0.0
+
+        def on_tile(done: int, total: int):
+            self.progress[job_id] = done / total
+
+        try:
+            image_data = await asyncio.to_thread(self.store.read_input, job_id)
+            while True:
+                try:
+                    result = await self.srgan.upscale_image_bytes(
+                        image_data, params["scale_factor"], params["options"], params["tier"], on_tile
+                    )
+                    break
+                except QueueFullError as e:
+                    # Синхронные запросы заняли очередь - задание подождет
+                    await asyncio.sleep(e.retry_after)
+            if result is None:
+                raise RuntimeError("Ошибка при обработке изображения")
+        except Exception as e:
+            self.failed += 1
+            await asyncio.to_thread(self.store.fail, job_id, str(e))
+        else:
+            self.completed += 1
+            media_type = image_encoding.media_type(params["options"])
+            await asyncio.to_thread(self.store.complete, job_id, result, media_type)
+
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job["callback_url"]:
+            await self._notify(job)
+
+    async def _notify(self, job: dict):
+        """POST-уведомление о завершении задания (одна попытка, ошибки только логируются)"""
+        payload = json.dumps(self.describe(job)).encode("utf-8")
+        request = urllib.request.Request(
+            job["callback_url"], data=payload, headers={"Content-Type": "application/json"}, method="POST"
+        )
+
+        def send():
+            with self._opener.open(request, timeout=self.callback_timeout):
+                pass
+
+        try:
+            await asyncio.to_thread(send)
+        except Exception as e:
+            self.callbacks_failed += 1
+            self.logger.log_error(e, f"job_callback {job['id']}")
+
+    async def _purge(self):
+        if self.last_purge is not None and time.monotonic() - self.last_purge < 600:
+            return
+        self.last_purge = time.monotonic()
+        removed = await asyncio.to_thread(self.store.purge, self.retention_sec)
+        if removed:
+            self.logger.info("Удалены устаревшие задания", count=removed)
+
+    async def stats(self) -> dict:
+        result = {
+            "workers": self.workers,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "running": len(self.progress),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "callbacks_failed": self.callbacks_failed,
+            "max_pending": self.max_pending,
+            "max_disk_bytes": self.max_disk_bytes,
+        }
+        if self.store is not None:
+            # Задания в хранилище по статусам, включая ожидающие очистки
+            result["stored"] = await asyncio.to_thread(self.store.counts)
+            result["disk_used_bytes"] = self.store.disk_used
+        return result
@@ -0,0 +1,67 @@
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+
+class ChannelsLast(nn.Module):
+    """Обертка, переводящая вход в формат channels_last перед генератором"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        return self.model(x.contiguous(memory_format=torch.channels_last))
+
+
+def fold_batchnorm(model: nn.Module) -> nn.Module:
+    """Вклеивание BatchNorm2d в предшествующий Conv2d внутри nn.Sequential (только eval)"""
+    for module in model.modules():
+        if not isinstance(module, nn.Sequential):
+            continue
+        names = list(module._modules.keys())
+        for conv_name, bn_name in zip(names, names[1:]):
+            conv = module._modules[conv_name]
+            bn = module._modules[bn_name]
+            if isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+                module._modules[conv_name] = fuse_conv_bn_eval(conv, bn)
+                module._modules[bn_name] = nn.Identity()
+    return model
+
+
+def configure_threads(num_threads: int = 0, interop_threads: int = 0):
+    """Настройка числа потоков PyTorch (0 - значение по умолчанию)"""
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    if interop_threads > 0:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Допустимо только до первого параллельного вычисления
+            pass
+
+
+def optimize_model(model: nn.Module, fold_bn: bool = True, channels_last: bool = False,
+                   jit: str = "none", example_input: torch.Tensor = None) -> nn.Module:
+    """
+    Подготовка загруженного генератора к инференсу.
+
+    jit: none - без компиляции, trace - TorchScript трассировка с заморозкой,
+         compile - torch.compile с динамическими размерами.
+    """
+    model.eval()
+    if fold_bn:
+        model = fold_batchnorm(model)
+    if channels_last:
+        model = ChannelsLast(model.to(memory_format=torch.channels_last)).eval()
+
+    if jit == "trace":
+        if example_input is None:
+            raise ValueError("Для трассировки нужен пример входа")
+        with torch.no_grad():
+            model = torch.jit.freeze(torch.jit.trace(model, example_input))
+    elif jit == "compile":
+        model = torch.compile(model, dynamic=True)
+    elif jit != "none":
+        raise ValueError(f"Неизвестный режим компиляции: {jit}")
+    return model
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+from PIL import Image
+
+PRECISIONS = ("fp32", "int8", "bf16")
+# Блоки, остающиеся в fp32 при int8: ошибка квантизации в блоках увеличения
+# (PixelShuffle + PReLU) растет вместе с разрешением и дает основную потерю качества
+FP32_MODULES = ("upsampling_blocks",)
+
+
+class BF16Model(nn.Module):
+    """Инференс генератора в bfloat16 через autocast, выход возвращается в fp32"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        with torch.autocast("cpu", dtype=torch.bfloat16):
+            return self.model(x).float()
+
+
+def bf16_supported() -> bool:
+    """Проверка аппаратной поддержки bf16 на CPU"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def calibration_samples(calibration_dir: str = "", count: int = 8, size: int = 64) -> list:
+    """
+    Набор входных тензоров для калибровки и оценки качества.
+
+    Берутся центральные фрагменты изображений из calibration_dir; если каталог
+    не задан или пуст, используется случайный шум (калибровка будет грубой).
+    """
+    samples = []
+    if calibration_dir and os.path.isdir(calibration_dir):
+        for name in sorted(os.listdir(calibration_dir)):
+            if len(samples) >= count:
+                break
+            try:
+                img = Image.open(os.path.join(calibration_dir, name)).convert("RGB")
+            except Exception:
+                continue
+            width, height = img.size
+            side = min(size, width, height)
+            left, top = (width - side) // 2, (height - side) // 2
+            crop = np.asarray(img.crop((left, top, left + side, top + side)), dtype=np.float32) / 255.0
+            samples.append(torch.from_numpy(crop).permute(2, 0, 1).unsqueeze(0).contiguous())
+    if not samples:
+        generator = torch.Generator().manual_seed(0)
+        samples = [torch.rand(1, 3, size, size, generator=generator) for _ in range(count)]
+    return samples
+
+
+def samples_digest(samples: list) -> str:
+    """Короткий хэш калибровочных данных: int8 артефакт привязан к ним так же, как к чекпоинту"""
+    digest = hashlib.sha256()
+    for sample in samples:
+        digest.update(str(tuple(sample.shape)).encode("utf-8"))
+        digest.update(sample.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()[:12]
+
+
+def quantization_engine() -> str:
+    """Движок квантованных операций: x86, затем fbgemm, затем qnnpack (ARM)"""
+    supported = torch.backends.quantized.supported_engines
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in supported:
+            return engine
+    raise RuntimeError(f"Нет движка int8 для этой платформы: {supported}")
+
+
+def quantize_int8(model: nn.Module, samples: list, backend: str = None,
+                  fp32_modules: tuple = FP32_MODULES) -> torch.jit.ScriptModule:
+    """Статическая int8 квантизация (FX graph mode) с калибровкой, результат - TorchScript"""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    model.eval()
+    backend = backend or quantization_engine()
+    torch.backends.quantized.engine = backend
+    qconfig_mapping = get_default_qconfig_mapping(backend)
+    for name in fp32_modules:
+        qconfig_mapping = qconfig_mapping.set_module_name(name, None)
+    prepared = prepare_fx(model, qconfig_mapping, example_inputs=(samples[0],))
+    with torch.no_grad():
+        for sample in samples:
+            prepared(sample)
+        quantized = convert_fx(prepared)
+        return torch.jit.freeze(torch.jit.trace(quantized, samples[0]))
+
+
+def _psnr(reference: torch.Tensor, candidate: torch.Tensor) -> float:
+    # Выход генератора в [-1, 1], переводим в [0, 1]
+    mse = torch.mean(((reference - candidate) * 0.5) ** 2).item()
+    return float("inf") if mse == 0 else 10.0 * np.log10(1.0 / mse)
+
+
+def compare_precision(reference: nn.Module, candidate: nn.Module, samples: list) -> dict:
+    """Ускорение и PSNR выхода пониженной точности относительно fp32"""
+    reference_time = 0.0
+    candidate_time = 0.0
+    psnr_values = []
+    with torch.inference_mode():
+        reference(samples[0])
+        candidate(samples[0])
+        for sample in samples:
+            started = time.perf_counter()
+            expected = reference(sample)
+            reference_time += time.perf_counter() - started
+
+            started = time.perf_counter()
+            actual = candidate(sample)
+            candidate_time += time.perf_counter() - started
+            psnr_values.append(_psnr(expected, actual.float()))
+
+    return {
+        "fp32_latency_sec": reference_time / len(samples),
+        "latency_sec": candidate_time / len(samples),
+        "speedup": reference_time / candidate_time if candidate_time else 0.0,
+        "psnr_vs_fp32_db": float(np.mean(psnr_values)),
+    }
@@ -0,0 +1,237 @@
+import asyncio
+import gc
+import json
+import math
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from .generator import Generator
+from utils.config import env_str, env_int
+
+DEFAULT_MODEL_PATH = "/app/models/gen_and_disc_V5.pth"
+DEFAULT_MODEL_URL = "https://drive.google.com/file/d/1EgdyWXjGPq-nuM1q3KBURCa0pPlQSpvx/view?usp=sharing"
+
+
+class ModelSpec:
+    """Описание чекпоинта генератора: масштаб, уровень качества и архитектура"""
+
+    def __init__(self, name: str, scale: int = 4, tier: str = "standard", path: str = DEFAULT_MODEL_PATH,
+                 url: str = "", num_blocks: int = 16, num_channels: int = 64,
+                 sha256: str = None, size: int = None, mirrors: list = None):
+        num_upsampling = int(round(math.log2(scale))) if scale > 1 else 0
+        if scale < 2 or 2 ** num_upsampling != scale:
+            raise ValueError(f"Масштаб модели должен быть степенью двойки: {scale}")
+        self.name = name
+        self.scale = scale
+        self.tier = tier
+        self.path = path
+        self.url = url
+        self.num_blocks = num_blocks
+        self.num_channels = num_channels
+        self.num_upsampling = num_upsampling
+        # Закрепленные контрольная сумма/размер чекпоинта и зеркала (локальные пути или HTTP)
+        self.sha256 = sha256
+        self.size = size
+        self.mirrors = list(mirrors or [])
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ModelSpec":
+        return cls(**data)
+
+    def build(self) -> Generator:
+        return Generator(
+            in_channels=3,
+            num_channels=self.num_channels,
+            num_blocks=self.num_blocks,
+            scale=2,
+            num_upsampling=self.num_upsampling
+        )
+
+    def version(self) -> str:
+        """Версия чекпоинта: имя, размер и время изменения файла"""
+        name = os.path.basename(self.path)
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return name
+        return f"{name}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def default_specs() -> list:
+    mirrors = [item.strip() for item in env_str("SRGAN_MODEL_MIRRORS", "").split(",") if item.strip()]
+    return [ModelSpec(
+        "srgan_x4",
+        scale=4,
+        tier="standard",
+        path=DEFAULT_MODEL_PATH,
+        url=DEFAULT_MODEL_URL,
+        sha256=env_str("SRGAN_MODEL_SHA256", "") or None,
+        size=env_int("SRGAN_MODEL_SIZE", 0) or None,
+        mirrors=mirrors
+    )]
+
+
+def load_specs(config_path: str = "") -> list:
+    """
+    Список моделей из JSON-файла вида
+    [{"name": "srgan_x2", "scale": 2, "tier": "standard", "path": "...", "num_blocks": 16}, ...]
+    либо модель по умолчанию (x4), если файл не задан.
+    """
+    if not config_path:
+        return default_specs()
+    with open(config_path, "r", encoding="utf-8") as f:
+        return [ModelSpec.from_dict(item) for item in json.load(f)]
+
+
+class LoadedModel:
+    """Загруженная модель реестра"""
+
+    def __init__(self, spec: ModelSpec, backend, size_bytes: int):
+        self.spec = spec
+        self.backend = backend
+        self.size_bytes = size_bytes
+        self.in_use = 0
+        # Версия результата: чекпоинт и фактический бэкенд (один os.stat на загрузку)
+        self.version = f"{spec.name}:{spec.version()}:{backend.name}:{backend.precision}"
+
+
+class ModelRegistry:
+    """
+    Реестр моделей по масштабу и уровню качества.
+
+    Модели загружаются лениво при первом обращении через loader(spec) и
+    вытесняются по LRU, когда суммарный размер превышает memory_bytes.
+    Используемые в данный момент модели не вытесняются.
+    """
+
+    def __init__(self, specs: list, loader, memory_bytes: int = 2048 * 1024 * 1024):
+        if not specs:
+            raise ValueError("Реестр моделей пуст")
+        # loader(spec) -> awaitable с LoadedModel
+        self.loader = loader
+        self.memory_bytes = memory_bytes
+        self.specs = OrderedDict((spec.name, spec) for spec in specs)
+        self.loaded = OrderedDict()
+        self.loading = {}
+        # Версии загружавшихся моделей сохраняются и после вытеснения
+        self.versions = {}
+
+        # Счетчики для мониторинга
+        self.loads = 0
+        self.evictions = 0
+
+    @property
+    def default_spec(self) -> ModelSpec:
+        return next(iter(self.specs.values()))
+
+    @property
+    def memory_used(self) -> int:
+        return sum(entry.size_bytes for entry in self.loaded.values())
+
+    def scales(self) -> list:
+        return sorted({spec.scale for spec in self.specs.values()})
+
+    def resolve(self, scale: int, tier: str = "standard") -> ModelSpec:
+        """
+        Выбор модели: наименьший масштаб не меньше запрошенного, при равенстве
+        предпочтение отдается запрошенному уровню качества.
+        """
+        candidates = [spec for spec in self.specs.values() if spec.scale >= scale]
+        if not candidates:
+            raise ValueError(f"Масштаб x{scale} не поддерживается, доступны: {self.scales()}")
+        return min(candidates, key=lambda spec: (spec.scale, spec.tier != tier))
+
+    @asynccontextmanager
+    async def use(self, spec: ModelSpec):
+        """Захват модели на время обработки запроса (с ленивой загрузкой)"""
+        entry = await self.acquire(spec)
+        try:
+            yield entry
+        finally:
+            self.release(entry)
+
+    def version(self, spec: ModelSpec):
+        """Версия модели для ключей кэша результатов либо None, если она еще не загружалась"""
+        entry = self.loaded.get(spec.name)
+        if entry is not None:
+            return entry.version
+        return self.versions.get(spec.name)
+
+    async def acquire(self, spec: ModelSpec) -> LoadedModel:
+        entry = self.loaded.get(spec.name)
+        if entry is None:
+            entry = await self._load(spec)
+            # Ожидавший общую загрузку мог возобновиться уже после вытеснения модели
+            entry = self.loaded.setdefault(spec.name, entry)
+        entry.in_use += 1
+        self.loaded.move_to_end(spec.name)
+        return entry
+
+    def release(self, entry: LoadedModel):
+        entry.in_use -= 1
+        self._evict()
+
+    async def _load(self, spec: ModelSpec) -> LoadedModel:
+        # Параллельные запросы к одной модели ждут одну загрузку
+        if spec.name in self.loading:
+            shared = self.loading[spec.name]
+            try:
+                return await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                # Отменили загружавший запрос, а не ожидающий - загрузка начинается заново
+                if shared.cancelled() and not asyncio.current_task().cancelling():
+                    return await self._load(spec)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self.loading[spec.name] = future
+        try:
+            entry = await self.loader(spec)
+            self.loaded[spec.name] = entry
+            self.versions[spec.name] = entry.version
+            # Вытеснение выполняется при освобождении, чтобы не выгрузить только что загруженную модель
+            self.loads += 1
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self.loading[spec.name]
+
+    def _evict(self):
+        evicted = False
+        while self.memory_used > self.memory_bytes:
+            idle = [name for name, entry in self.loaded.items() if entry.in_use == 0]
+            if len(self.loaded) <= 1 or not idle:
+                break
+            del self.loaded[idle[0]]
+            self.evictions += 1
+            evicted = True
+        if evicted:
+            gc.collect()
+
+    def clear(self):
+        self.loaded.clear()
+        gc.collect()
+
+    def stats(self) -> dict:
+        models = {}
+        for name, spec in self.specs.items():
+            models[name] = {"scale": spec.scale, "tier": spec.tier, "loaded": name in self.loaded}
+            entry = self.loaded.get(name)
+            if entry is not None:
+                # Фактический бэкенд загруженной модели (с учетом отката на torch)
+                models[name]["backend"] = entry.backend.name
+                models[name]["precision"] = entry.backend.precision
+        return {
+            "models": models,
+            "memory_used_bytes": self.memory_used,
+            "memory_budget_bytes": self.memory_bytes,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
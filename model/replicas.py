@@ -0,0 +1,341 @@
+import asyncio
+import itertools
+import os
+import queue
+import threading
+import time
+import torch.multiprocessing as mp
+from .inference_pool import QueueFullError
+from .registry import LoadedModel, ModelSpec
+from .backends import TorchBackend
+from .degrade import LatencyEstimator
+from utils.upload_limit import ImageTooLargeError
+from .deadline import Deadline, RequestCancelled, DISCONNECTED, EXPIRED
+
+# Коды флага отмены запроса в общей памяти (0 - запрос нужен)
+_CANCEL_CODES = {DISCONNECTED: 1, EXPIRED: 2}
+_CANCEL_REASONS = {code: reason for reason, code in _CANCEL_CODES.items()}
+
+
+def core_slices(replicas: int) -> list:
+    """Разбиение доступных процессу ядер на непересекающиеся срезы по числу реплик"""
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    if replicas >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(replicas)]
+    per_replica = len(cores) // replicas
+    return [cores[i * per_replica:(i + 1) * per_replica] for i in range(replicas)]
+
+
+class _SharedDeadline(Deadline):
+    """Срок запроса в реплике: отмена, выставленная родителем во флаге слота, видна в безопасных точках"""
+
+    def __init__(self, flags, slot: int, expires_at):
+        super().__init__()
+        # time.monotonic() общий для процессов одной машины
+        self.expires_at = expires_at
+        self.flags = flags
+        self.slot = slot
+
+    def reason(self):
+        code = self.flags[self.slot]
+        if code:
+            return _CANCEL_REASONS.get(code, DISCONNECTED)
+        return super().reason()
+
+
+def _replica_main(index: int, model, spec: ModelSpec, cores: list, threads: int, requests, responses,
+                  cancel_flags):
+    """Процесс-реплика: полный цикл обработки на общих весах, привязанный к своим ядрам"""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    # Реплика не кэширует результаты и не запускает собственных реплик
+    os.environ.update({
+        "SRGAN_NUM_THREADS": str(threads),
+        "SRGAN_INFERENCE_WORKERS": "1",
+        "SRGAN_REPLICAS": "0",
+        "SRGAN_CACHE_MEMORY_MB": "0",
+        "SRGAN_CACHE_DIR": "",
+    })
+    from .srgan_wrapper import SRGANWrapper
+
+    wrapper = SRGANWrapper()
+    entry = LoadedModel(spec, TorchBackend(model), 0)
+    wrapper.warmup(entry.backend)
+    responses.put((index, None, None, None, 0.0))
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, slot, image_data, scale_factor, options, expires_at = request
+        deadline = _SharedDeadline(cancel_flags, slot, expires_at)
+        # Время обслуживания замеряется в реплике: ожидание в ее очереди не учитывается
+        started = time.perf_counter()
+        try:
+            result = wrapper._upscale_sync(image_data, scale_factor, options, entry, deadline=deadline)
+            responses.put((index, request_id, result, None, time.perf_counter() - started))
+        except RequestCancelled as e:
+            responses.put((index, request_id, None, ("cancelled", e.reason), 0.0))
+        except ImageTooLargeError as e:
+            responses.put((index, request_id, None, ("too_large", str(e)), 0.0))
+        except ValueError as e:
+            # Некорректный вход - ошибка клиента (400), а не сбой реплики
+            responses.put((index, request_id, None, ("value", str(e)), 0.0))
+        except Exception as e:
+            responses.put((index, request_id, None, ("error", str(e)), 0.0))
+
+
+class ReplicaPool:
+    """
+    Процессы-реплики модели по умолчанию для масштабирования по ядрам.
+
+    Веса генератора один раз переносятся в общую память и передаются репликам
+    без копирования. Каждая реплика привязана к своему срезу ядер с подобранным
+    числом потоков intra-op, а запрос отправляется наименее загруженной реплике.
+    Общее число запросов в работе ограничено, как и в InferencePool.
+    """
+
+    def __init__(self, model, spec: ModelSpec, replicas: int, max_queue: int = 8, threads: int = 0,
+                 latency_window: float = 60.0):
+        self.model = model.share_memory()
+        self.spec = spec
+        self.replicas = max(1, replicas)
+        self.max_queue = max(0, max_queue)
+        self.threads = threads
+        self.cores = core_slices(self.replicas)
+        self.processes = [None] * self.replicas
+        self.requests = [None] * self.replicas
+        self.responses = None
+        self.context = mp.get_context("spawn")
+        # Флаги отмены в общей памяти, по слоту на каждый допустимый запрос в работе
+        self.cancel_flags = self.context.RawArray("b", self.replicas + self.max_queue)
+        self.free_slots = list(range(len(self.cancel_flags)))
+        self.load = [0] * self.replicas
+        self.alive = [False] * self.replicas
+        self.pending = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._reader = None
+        self._stopping = False
+
+        # Счетчики для мониторинга
+        self.completed = [0] * self.replicas
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.restarts = 0
+        # Недавнее время обслуживания в репликах для оценки задержки
+        self.latency = LatencyEstimator(latency_window)
+
+    @property
+    def in_flight(self) -> int:
+        return sum(self.load)
+
+    def _spawn(self, index: int):
+        """Запуск процесса-реплики со своей очередью запросов; готовность придет через responses"""
+        requests = self.context.Queue()
+        process = self.context.Process(
+            target=_replica_main,
+            args=(index, self.model, self.spec, self.cores[index], self.threads or len(self.cores[index]),
+                  requests, self.responses, self.cancel_flags),
+            name=f"srgan-replica-{index}",
+            daemon=True
+        )
+        process.start()
+        self.requests[index] = requests
+        self.processes[index] = process
+
+    def start(self, timeout: float = 300.0):
+        """Запуск реплик и ожидание их прогрева (реплика, завершившаяся при старте, - ошибка)"""
+        self.responses = self.context.Queue()
+        for index in range(self.replicas):
+            self._spawn(index)
+
+        deadline = time.monotonic() + timeout
+        while not all(self.alive):
+            for index, process in enumerate(self.processes):
+                if not self.alive[index] and not process.is_alive():
+                    raise RuntimeError(f"Реплика {index} завершилась при запуске (код {process.exitcode})")
+            if time.monotonic() >= deadline:
+                raise RuntimeError("Реплики не прогрелись за отведенное время")
+            try:
+                index, *_ = self.responses.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            self.alive[index] = True
+
+        self._reader = threading.Thread(target=self._read_responses, name="srgan-replica-reader", daemon=True)
+        self._reader.start()
+
+    def retry_after(self) -> int:
+        avg_service = self.latency.service_time() or 1.0
+        return max(1, int(round(avg_service * (self.in_flight + 1) / self.replicas)))
+
+    def estimated_latency(self, pixels: int) -> float:
+        """Оценка времени ответа нового запроса из pixels пикселей с учетом очереди (секунды)"""
+        return self.latency.estimate(pixels, self.in_flight, max(1, sum(self.alive)))
+
+    @property
+    def queued(self) -> int:
+        return sum(max(0, load - 1) for load in self.load)
+
+    async def run(self, image_data: bytes, scale_factor: int, options: dict, deadline: Deadline = None,
+                  pixels: int = 0):
+        """
+        Обработка изображения наименее загруженной живой репликой. Реплика проверяет
+        срок запроса в безопасных точках. При отмене ожидания (отключение клиента,
+        истекший срок) выставляется флаг слота в общей памяти, и реплика прерывает
+        обработку в ближайшей безопасной точке; место в очереди освобождается
+        только по ответу реплики.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            candidates = [index for index in range(self.replicas) if self.alive[index]]
+            if not candidates:
+                raise RuntimeError("Нет доступных реплик модели")
+            rejected = self.in_flight >= len(candidates) + self.max_queue or not self.free_slots
+            if not rejected:
+                index = min(candidates, key=lambda i: self.load[i])
+                request_id = next(self._ids)
+                slot = self.free_slots.pop()
+                self.cancel_flags[slot] = 0
+                self.pending[request_id] = (future, loop, index, pixels, slot)
+                self.load[index] += 1
+        if rejected:
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+
+        try:
+            expires_at = deadline.expires_at if deadline is not None else None
+            self.requests[index].put((request_id, slot, image_data, scale_factor, options, expires_at))
+        except BaseException:
+            self._finish(request_id)
+            raise
+        try:
+            return await future
+        except RequestCancelled:
+            if deadline is not None:
+                deadline.record("replica")
+            raise
+        except asyncio.CancelledError:
+            reason = deadline.reason() if deadline is not None else None
+            self.cancel_flags[slot] = _CANCEL_CODES[reason or DISCONNECTED]
+            self.cancelled += 1
+            raise
+
+    def _finish(self, request_id: int):
+        """Освобождение слота и места в очереди завершенного запроса"""
+        with self._lock:
+            item = self.pending.pop(request_id, None)
+            if item is not None:
+                self.load[item[2]] -= 1
+                self.free_slots.append(item[4])
+        return item
+
+    def _read_responses(self):
+        """Фоновый поток: доставка результатов реплик в цикл событий и контроль их жизни"""
+        last_check = time.monotonic()
+        while not self._stopping:
+            if time.monotonic() - last_check >= 1.0:
+                self._check_alive()
+                last_check = time.monotonic()
+            try:
+                index, request_id, result, error, service = self.responses.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if request_id is None:
+                # Перезапущенная реплика прогрелась
+                self.alive[index] = True
+                continue
+            item = self._finish(request_id)
+            if item is None:
+                continue
+            self.completed[index] += 1
+            future, loop = item[:2]
+            if error is None:
+                self.latency.observe(service, item[3])
+                _deliver(loop, _set_result, future, result)
+                continue
+            kind, message = error
+            if kind == "cancelled":
+                exception = RequestCancelled(message)
+            elif kind == "too_large":
+                exception = ImageTooLargeError(message)
+            elif kind == "value":
+                exception = ValueError(message)
+            else:
+                self.failed += 1
+                exception = RuntimeError(message)
+            _deliver(loop, _set_exception, future, exception)
+
+    def _check_alive(self):
+        """Аварийно завершившаяся реплика: ее запросы завершаются ошибкой, процесс перезапускается"""
+        for index, process in enumerate(self.processes):
+            if process.is_alive() or self._stopping:
+                continue
+            self.alive[index] = False
+            with self._lock:
+                lost = [key for key, item in self.pending.items() if item[2] == index]
+            items = [self._finish(key) for key in lost]
+            for future, loop, *_ in items:
+                self.failed += 1
+                _deliver(loop, _set_exception, future, RuntimeError(f"Реплика {index} завершилась аварийно"))
+            # Не чаще раза в секунду (период проверки), реплика станет доступна после прогрева
+            self.restarts += 1
+            self._spawn(index)
+
+    def stats(self) -> dict:
+        return {
+            "replicas": self.replicas,
+            "alive": sum(self.alive),
+            "cores": self.cores,
+            "threads_per_replica": [self.threads or len(cores) for cores in self.cores],
+            "load": list(self.load),
+            "completed": list(self.completed),
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "restarts": self.restarts,
+            "latency": self.latency.stats(),
+            "shared_weights_bytes": sum(t.numel() * t.element_size() for t in self.model.state_dict().values()),
+        }
+
+    def shutdown(self, timeout: float = 5.0):
+        self._stopping = True
+        for requests in self.requests:
+            if requests is None:
+                continue
+            try:
+                requests.put(None)
+            except (OSError, ValueError):
+                pass
+        for process in self.processes:
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+
+def _deliver(loop: asyncio.AbstractEventLoop, callback, future: asyncio.Future, value):
+    """Передача ответа в цикл событий запроса; ответ на запрос закрытого цикла уже никому не нужен"""
+    if loop.is_closed():
+        return
+    try:
+        loop.call_soon_threadsafe(callback, future, value)
+    except RuntimeError:
+        # Цикл закрылся между проверкой и вызовом
+        pass
+
+
+def _set_result(future: asyncio.Future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, error: Exception):
+    if not future.done():
+        future.set_exception(error)
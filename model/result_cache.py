@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Optional
+from .deadline import RequestCancelled
+
+
+class ResultCache:
+    """
+    Контентно-адресуемый кэш результатов апскейла.
+
+    Ключ - хэш входных байтов, версии модели и параметров вывода.
+    Уровни: LRU в памяти с лимитом по байтам и необязательный дисковый кэш.
+    Одинаковые запросы, пришедшие одновременно, объединяются в одно вычисление.
+    """
+
+    def __init__(self, memory_bytes: int = 256 * 1024 * 1024, disk_dir: str = "",
+                 disk_bytes: int = 1024 * 1024 * 1024):
+        self.memory_bytes = max(0, memory_bytes)
+        self.disk_dir = disk_dir
+        self.disk_bytes = max(0, disk_bytes)
+
+        self.memory = OrderedDict()
+        self.memory_used = 0
+        self.disk = OrderedDict()
+        self.disk_used = 0
+        self.in_flight = {}
+
+        # Счетчики для мониторинга
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+
+        # Каталог создается при первой записи
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            self._scan_disk()
+
+    @staticmethod
+    def make_key(data: bytes, model_version: str, options: dict) -> str:
+        digest = hashlib.sha256(data)
+        digest.update(model_version.encode("utf-8"))
+        digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    async def get_or_compute(self, key: str, compute) -> Optional[bytes]:
+        """
+        Значение из кэша либо результат await compute() (None не кэшируется).
+
+        Вычисление выполняется отдельной задачей, общей для всех одинаковых
+        запросов: отмена одного из них не прерывает ее, пока результат ждет
+        кто-то еще, и снимает ее, когда ожидающих не осталось.
+        """
+        value = self._memory_get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        entry = self.in_flight.get(key)
+        if entry is not None:
+            self.coalesced += 1
+            return await self._wait(key, entry, compute, owner=False)
+
+        entry = self.in_flight[key] = [None, 0]
+        entry[0] = asyncio.ensure_future(self._compute(key, entry, compute))
+        return await self._wait(key, entry, compute, owner=True)
+
+    async def _wait(self, key: str, entry: list, compute, owner: bool) -> Optional[bytes]:
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except RequestCancelled:
+            # Истек срок запроса-владельца вычисления, а не ожидающего - вычисляем заново
+            if owner:
+                raise
+            return await self.get_or_compute(key, compute)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                # Результат больше никому не нужен
+                task.cancel()
+                self._forget(key, entry)
+
+    async def _compute(self, key: str, entry: list, compute) -> Optional[bytes]:
+        try:
+            value = await self._disk_get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self._memory_put(key, value)
+                return value
+            self.misses += 1
+            value = await compute()
+            if value is not None:
+                self._memory_put(key, value)
+                await self._disk_put(key, value)
+            return value
+        finally:
+            self._forget(key, entry)
+
+    def _forget(self, key: str, entry: list):
+        if self.in_flight.get(key) is entry:
+            del self.in_flight[key]
+
+    def peek(self, key: str) -> Optional[bytes]:
+        """Значение из памяти без вычисления (None, если его нет)"""
+        value = self._memory_get(key)
+        if value is not None:
+            self.memory_hits += 1
+        return value
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, key: str, value: bytes):
+        if len(value) > self.memory_bytes:
+            return
+        if key in self.memory:
+            self.memory_used -= len(self.memory.pop(key))
+        self.memory[key] = value
+        self.memory_used += len(value)
+        while self.memory_used > self.memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_used -= len(evicted)
+            self.memory_evictions += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _scan_disk(self):
+        """Восстановление индекса дискового кэша после перезапуска"""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self.disk[name] = size
+            self.disk_used += size
+
+    async def _disk_get(self, key: str) -> Optional[bytes]:
+        if not self.disk_dir or key not in self.disk:
+            return None
+
+        def read():
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    return f.read()
+            except OSError:
+                return None
+
+        value = await asyncio.to_thread(read)
+        if value is None:
+            self.disk_used -= self.disk.pop(key, 0)
+        else:
+            self.disk.move_to_end(key)
+        return value
+
+    async def _disk_put(self, key: str, value: bytes):
+        if not self.disk_dir or len(value) > self.disk_bytes:
+            return
+        path = self._disk_path(key)
+
+        def write():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+
+        await asyncio.to_thread(write)
+        self.disk_used -= self.disk.pop(key, 0)
+        self.disk[key] = len(value)
+        self.disk_used += len(value)
+
+        evicted = []
+        while self.disk_used > self.disk_bytes:
+            old_key, size = self.disk.popitem(last=False)
+            self.disk_used -= size
+            self.disk_evictions += 1
+            evicted.append(self._disk_path(old_key))
+        if evicted:
+            await asyncio.to_thread(self._remove_files, evicted)
+
+    @staticmethod
+    def _remove_files(paths: list):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "memory_evictions": self.memory_evictions,
+            "disk_evictions": self.disk_evictions,
+            "memory_entries": len(self.memory),
+            "memory_used_bytes": self.memory_used,
+            "disk_entries": len(self.disk),
+            "disk_used_bytes": self.disk_used,
+        }
@@ -1,119 +1,657 @@
 import numpy as np
 import torch
-from .generator import Generator
+from .registry import ModelRegistry, ModelSpec, LoadedModel, load_specs
+from .tiling import tiled_forward, tiled_forward_uint8
+from .inference_pool import InferencePool, QueueFullError
+from .replicas import ReplicaPool
+from .degrade import DegradePolicy, BICUBIC
+from .deadline import Deadline, RequestCancelled, checkpoint
+from .batcher import BatchScheduler, collate
+from .result_cache import ResultCache
+from .optimize import optimize_model, configure_threads
+from .backends import BACKENDS, TorchBackend, OnnxBackend, export_onnx, parity_error
+from .checkpoint import extract_generator_weights, load_generator_weights, parse_shapes
+from .quantization import PRECISIONS, BF16Model, bf16_supported, calibration_samples, quantization_engine, quantize_int8, samples_digest, compare_precision
 from transform.transform import Transforms
 import io
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 import base64
 from typing import Optional
 from utils.server_logger import ServerLogger
 from utils.download_model import download_model
+from utils.config import env_int, env_float, env_str, env_bool
+from utils import image_encoding
+from utils.metrics import METRICS
+from utils.upload_limit import ImageTooLargeError
 import os
+import copy
+import math
+import hashlib
+import asyncio
+import time
 
 class SRGANWrapper:
     def __init__(self):
         """Инициализация обертки для модели SRGAN"""
+        self.boot_started = time.perf_counter()
+        self.boot_to_ready = None
         self.logger = ServerLogger()
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model = Generator(in_channels=3).to(self.device)
         self.transform = Transforms()
         self.ready = False
-        self.model_path = "/app/models/gen_and_disc_V5.pth"
-        self.model_url = "https://drive.google.com/file/d/1EgdyWXjGPq-nuM1q3KBURCa0pPlQSpvx/view?usp=sharing"
+        # Реестр моделей по масштабу и уровню качества с ленивой загрузкой
+        self.registry = ModelRegistry(
+            load_specs(env_str("SRGAN_MODELS_CONFIG", "")),
+            self._load_spec,
+            memory_bytes=env_int("SRGAN_MODEL_MEMORY_MB", 2048) * 1024 * 1024
+        )
+        # Параметры тайлового инференса (0 - обработка целиком)
+        self.tile_size = env_int("SRGAN_TILE_SIZE", 128)
+        self.tile_overlap = env_int("SRGAN_TILE_OVERLAP", 32)
+        self.max_image_side = env_int("SRGAN_MAX_IMAGE_SIDE", 4096)
+        # Уменьшенное декодирование JPEG (draft), если выход все равно будет уменьшен
+        self.jpeg_draft = env_bool("SRGAN_JPEG_DRAFT", False)
+        # Пул инференса вне цикла событий с ограниченной очередью
+        # Окно замеров времени обслуживания для оценки задержки (секунды)
+        self.latency_window = env_float("SRGAN_LATENCY_WINDOW_SEC", 60.0)
+        self.pool = InferencePool(
+            workers=env_int("SRGAN_INFERENCE_WORKERS", 1),
+            max_queue=env_int("SRGAN_INFERENCE_QUEUE", 8),
+            latency_window=self.latency_window
+        )
+        # Микробатчинг (1 - выключен, каждый запрос обрабатывается отдельно)
+        max_batch_size = env_int("SRGAN_MAX_BATCH_SIZE", 1)
+        self.batcher = None
+        if max_batch_size > 1:
+            self.batcher = BatchScheduler(
+                self._run_batch,
+                max_batch_size=max_batch_size,
+                max_wait_ms=env_float("SRGAN_BATCH_WAIT_MS", 10.0),
+                bucket_policy=env_str("SRGAN_BATCH_BUCKETS", "pad"),
+                pad_multiple=env_int("SRGAN_BATCH_PAD_MULTIPLE", 64)
+            )
+        # Оптимизации модели после загрузки
+        self.optimize_options = {
+            "fold_bn": env_bool("SRGAN_FOLD_BN", True),
+            "channels_last": env_bool("SRGAN_CHANNELS_LAST", False),
+            "jit": env_str("SRGAN_JIT", "none"),
+        }
+        self.use_inference_mode = env_bool("SRGAN_INFERENCE_MODE", True)
+        # Пониженная точность: fp32 | int8 | bf16 (только CPU)
+        self.precision = env_str("SRGAN_PRECISION", "fp32")
+        if self.precision not in PRECISIONS:
+            raise ValueError(f"Неизвестная точность: {self.precision}")
+        self.calibration_dir = env_str("SRGAN_CALIBRATION_DIR", "")
+        self.calibration_count = env_int("SRGAN_CALIBRATION_SAMPLES", 8)
+        self.precision_report = None
+        # Бэкенд инференса: torch | onnx
+        self.backend = env_str("SRGAN_BACKEND", "torch")
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд: {self.backend}")
+        self.onnx_tolerance = env_float("SRGAN_ONNX_TOLERANCE", 1e-3)
+        # Прогрев на типичных размерах входа перед объявлением готовности
+        self.warmup_shapes = parse_shapes(env_str("SRGAN_WARMUP_SHAPES", "64x64,128x128"))
+        configure_threads(env_int("SRGAN_NUM_THREADS", 0), env_int("SRGAN_INTEROP_THREADS", 0))
+        # Процессы-реплики модели по умолчанию с общими весами (0 - инференс в этом процессе)
+        self.replica_count = env_int("SRGAN_REPLICAS", 0)
+        self.replica_threads = env_int("SRGAN_REPLICA_THREADS", 0)
+        if self.replica_count > 0 and self.device != "cpu":
+            self.logger.warning("Реплики поддерживаются только на CPU, инференс выполняется в основном процессе")
+            self.replica_count = 0
+        self.replicas = None
+        # Деградация под нагрузкой: off | bicubic | уровень качества более легкой модели
+        self.degrade = DegradePolicy(
+            fallback=env_str("SRGAN_FALLBACK", "off"),
+            latency_target_ms=env_float("SRGAN_LATENCY_TARGET_MS", 0.0),
+            queue_depth=env_int("SRGAN_FALLBACK_QUEUE_DEPTH", 0)
+        )
+        # Упрощенные ответы тоже ограничены: собственный пул с очередью
+        self.fallback_pool = InferencePool(
+            workers=env_int("SRGAN_FALLBACK_WORKERS", 1),
+            max_queue=env_int("SRGAN_FALLBACK_QUEUE", 16)
+        )
+        # Кэш результатов (память + необязательный диск)
+        self.cache = ResultCache(
+            memory_bytes=env_int("SRGAN_CACHE_MEMORY_MB", 256) * 1024 * 1024,
+            disk_dir=env_str("SRGAN_CACHE_DIR", ""),
+            disk_bytes=env_int("SRGAN_CACHE_DISK_MB", 1024) * 1024 * 1024
+        )
         self.logger.info(f"Initialized SRGAN wrapper on device: {self.device}")
     
+    @property
+    def model(self):
+        """Бэкенд модели по умолчанию, если она загружена"""
+        entry = self.registry.loaded.get(self.registry.default_spec.name)
+        return entry.backend if entry is not None else None
+
     async def load_model(self) -> bool:
-        """Загрузка модели SRGAN"""
+        """Загрузка модели SRGAN по умолчанию (остальные загружаются по требованию)"""
         try:
-            # Скачиваем модель, если она еще не существует
-            if not await download_model(self.model_path, self.model_url):
-                self.logger.error("Не удалось скачать модель")
-                return False
-            print("load start")
-            # Загружаем модель
-            checkpoint = torch.load(self.model_path, map_location=self.device, weights_only=False)
-            print("load complited")
-            self.model.load_state_dict(checkpoint["generator_state_dict"])
-            
-            self.model.eval()
+            entry = await self.registry.acquire(self.registry.default_spec)
+            self.registry.release(entry)
+            if self.replica_count > 0:
+                await asyncio.to_thread(self._start_replicas, entry)
             self.ready = True
-            self.logger.info("Модель SRGAN успешно загружена")
+            self.boot_to_ready = time.perf_counter() - self.boot_started
+            self.logger.info(f"Модель SRGAN успешно загружена, готовность через {self.boot_to_ready:.2f} с")
             return True
         except Exception as e:
             self.logger.error(f"Ошибка при загрузке модели SRGAN: {e}")
             self.ready = False
             return False
-    
+
+    async def _load_spec(self, spec: ModelSpec) -> LoadedModel:
+        """Загрузчик для реестра: скачивание чекпоинта и подготовка бэкенда вне цикла событий"""
+        if not await download_model(spec.path, spec.url, spec.sha256, spec.size, spec.mirrors):
+            raise RuntimeError(f"Не удалось получить модель {spec.name}")
+        return await asyncio.to_thread(self._build_model, spec)
+
+    def _build_model(self, spec: ModelSpec) -> LoadedModel:
+        self.logger.info(f"Загрузка модели {spec.name} (x{spec.scale}, {spec.tier})")
+        started = time.perf_counter()
+
+        # Компактный файл только с весами генератора, отображаемый в память
+        weights_path = self._artifact_path(spec, "weights.pt")
+        if os.path.exists(weights_path):
+            state_dict = load_generator_weights(weights_path)
+        else:
+            self.logger.info(f"Извлечение весов генератора в {weights_path}")
+            state_dict = extract_generator_weights(spec.path, weights_path)
+
+        # Модель создается на meta-устройстве, чтобы не тратить время на случайную инициализацию
+        with torch.device("meta"):
+            model = spec.build()
+        model.load_state_dict(state_dict, assign=True)
+        model = model.to(self.device).eval()
+        loaded = time.perf_counter()
+
+        size_bytes = sum(t.numel() * t.element_size() for t in model.state_dict().values())
+        backend = self.prepare_model(model, spec)
+        prepared = time.perf_counter()
+
+        self.warmup(backend)
+        self.logger.info(
+            f"Модель {spec.name}: загрузка {loaded - started:.2f} с, "
+            f"подготовка {prepared - loaded:.2f} с, прогрев {time.perf_counter() - prepared:.2f} с"
+        )
+        return LoadedModel(spec, backend, size_bytes)
+
+    def _start_replicas(self, entry: LoadedModel):
+        started = time.perf_counter()
+        self.replicas = ReplicaPool(
+            entry.backend.model,
+            entry.spec,
+            self.replica_count,
+            max_queue=env_int("SRGAN_INFERENCE_QUEUE", 8),
+            threads=self.replica_threads,
+            latency_window=self.latency_window
+        )
+        self.replicas.start()
+        self.logger.info(
+            f"Запущено реплик: {self.replica_count} за {time.perf_counter() - started:.2f} с",
+            cores=self.replicas.cores
+        )
+
+    def warmup(self, backend):
+        """Прогон модели на типичных размерах для инициализации ядер и аллокатора"""
+        for height, width in self.warmup_shapes:
+            self.forward(torch.zeros(1, 3, height, width, device=self.device), backend)
+
+    def prepare_model(self, model, spec: ModelSpec):
+        """Оптимизация загруженного генератора и создание бэкенда инференса"""
+        if self.replica_count > 0 and spec.name == self.registry.default_spec.name:
+            return self._prepare_shared(model)
+        if self.backend == "onnx":
+            if self.device == "cpu":
+                backend = self._prepare_onnx(model, spec)
+                if backend is not None:
+                    return backend
+            else:
+                self.logger.warning("ONNX бэкенд поддерживается только на CPU, используется torch")
+        return self._prepare_torch(model, spec)
+
+    def _prepare_shared(self, model):
+        """
+        Модель для реплик: веса в общей памяти, поэтому допустимы только
+        преобразования обычного nn.Module (TorchScript и ONNX не передаются между процессами).
+        """
+        if self.backend != "torch" or self.precision != "fp32" or self.optimize_options["jit"] != "none":
+            self.logger.warning("В режиме реплик используется torch fp32 без JIT")
+        model = optimize_model(
+            model,
+            fold_bn=self.optimize_options["fold_bn"],
+            channels_last=self.optimize_options["channels_last"]
+        )
+        return TorchBackend(model.share_memory())
+
+    def _prepare_onnx(self, model, spec: ModelSpec):
+        """Экспорт в ONNX (с кэшем рядом с чекпоинтом) и проверка совпадения с PyTorch"""
+        if self.precision != "fp32":
+            self.logger.warning(f"ONNX бэкенд работает в fp32, точность {self.precision} игнорируется")
+        model = optimize_model(model, fold_bn=self.optimize_options["fold_bn"])
+        onnx_path = self._artifact_path(spec, "onnx")
+        try:
+            if not os.path.exists(onnx_path):
+                self.logger.info(f"Экспорт генератора в ONNX: {onnx_path}")
+                export_onnx(model, onnx_path)
+            backend = OnnxBackend(onnx_path, env_int("SRGAN_NUM_THREADS", 0))
+        except Exception as e:
+            self.logger.log_error(e, "onnx_backend")
+            return None
+
+        error = parity_error(model, backend)
+        if error > self.onnx_tolerance:
+            self.logger.error(f"Выход ONNX расходится с PyTorch ({error:.2e}), используется torch")
+            return None
+        self.logger.info(f"ONNX бэкенд готов, расхождение с PyTorch {error:.2e}")
+        return backend
+
+    def _artifact_path(self, spec: ModelSpec, suffix: str) -> str:
+        """Путь к производному артефакту модели рядом с .pth, привязанный к версии чекпоинта"""
+        version_hash = hashlib.sha256(spec.version().encode("utf-8")).hexdigest()[:12]
+        return f"{os.path.splitext(spec.path)[0]}.{version_hash}.{suffix}"
+
+    def _prepare_torch(self, model, spec: ModelSpec):
+        """Оптимизация генератора PyTorch и перевод в выбранную точность"""
+        precision = self.precision
+        if precision != "fp32" and self.device != "cpu":
+            self.logger.warning(f"Точность {precision} поддерживается только на CPU, используется fp32")
+            precision = "fp32"
+        if precision == "bf16" and not bf16_supported():
+            self.logger.warning("CPU не поддерживает bf16, используется fp32")
+            precision = "fp32"
+
+        if precision == "int8":
+            model = optimize_model(model, fold_bn=self.optimize_options["fold_bn"])
+            samples = calibration_samples(self.calibration_dir, self.calibration_count)
+            quantized = self._load_or_quantize(model, spec, samples)
+            self._report_precision(model, quantized, samples, precision)
+            return TorchBackend(quantized, precision)
+
+        model = optimize_model(
+            model,
+            example_input=torch.rand(1, 3, 64, 64, device=self.device),
+            **self.optimize_options
+        )
+        self.logger.info(f"Оптимизации модели: {self.optimize_options}")
+        if precision == "bf16":
+            reference = model
+            model = BF16Model(model)
+            self._report_precision(reference, model, calibration_samples(self.calibration_dir, self.calibration_count), precision)
+        return TorchBackend(model, precision)
+
+    def _load_or_quantize(self, model, spec: ModelSpec, samples: list):
+        """int8 модель из кэша на диске либо квантизация с калибровкой и сохранение"""
+        # Артефакт зависит от движка квантизации, вклеивания BatchNorm, блоков в fp32
+        # и калибровочных данных (смена SRGAN_CALIBRATION_DIR требует новой калибровки)
+        engine = quantization_engine()
+        fold = "fold" if self.optimize_options["fold_bn"] else "nofold"
+        cache_path = self._artifact_path(spec, f"int8-{engine}-{fold}-mixed-{samples_digest(samples)}.pt")
+        if os.path.exists(cache_path):
+            self.logger.info(f"Загрузка int8 модели из кэша: {cache_path}")
+            torch.backends.quantized.engine = engine
+            return torch.jit.load(cache_path, map_location="cpu")
+
+        self.logger.info(f"Калибровка int8 ({engine}) на {len(samples)} изображениях...")
+        quantized = quantize_int8(copy.deepcopy(model), samples, engine)
+        try:
+            tmp_path = f"{cache_path}.tmp"
+            torch.jit.save(quantized, tmp_path)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            self.logger.warning(f"Не удалось сохранить int8 модель: {e}")
+        return quantized
+
+    def _report_precision(self, reference, candidate, samples: list, precision: str):
+        self.precision_report = dict(compare_precision(reference, candidate, samples), precision=precision)
+        self.logger.info(
+            f"Точность {precision}: ускорение x{self.precision_report['speedup']:.2f}, "
+            f"PSNR относительно fp32 {self.precision_report['psnr_vs_fp32_db']:.2f} дБ"
+        )
+
     async def upscale_image(self, image_data: bytes, scale_factor: int = 4) -> Optional[str]:
-        """Увеличение разрешения изображения с помощью SRGAN"""
-        print(self.ready)
-        print(self.model)
-        if not self.ready or self.model is None:
+        """Увеличение разрешения изображения с помощью SRGAN (результат в base64 PNG)"""
+        result = await self.upscale_image_bytes(image_data, scale_factor)
+        if result is None:
+            return None
+        return base64.b64encode(result).decode("utf-8")
+
+    async def upscale_image_bytes(self, image_data: bytes, scale_factor: int = 4,
+                                  options: Optional[dict] = None, tier: str = "standard",
+                                  progress=None, deadline: Optional[Deadline] = None) -> Optional[bytes]:
+        """
+        Увеличение разрешения изображения, результат закодирован согласно options.
+
+        Модель выбирается по scale_factor и tier; если подходящей модели с точным
+        масштабом нет, используется ближайшая большая и результат уменьшается.
+        progress(done, total) вызывается из пула инференса после каждого тайла.
+        Если задан deadline, обработка прерывается с RequestCancelled в безопасных
+        точках после истечения срока или отмены.
+        """
+        spec = self._resolve_request(scale_factor, tier)
+        options = options or image_encoding.output_options()
+        return await self.cache.get_or_compute(
+            self._cache_key(image_data, scale_factor, options, spec),
+            lambda: self._process(image_data, scale_factor, options, spec, progress, deadline)
+        )
+
+    def _resolve_request(self, scale_factor: int, tier: str) -> ModelSpec:
+        """Проверка готовности и параметров запроса и выбор модели"""
+        if not self.ready:
             self.logger.error("Model not loaded")
             raise RuntimeError("Модель SRGAN не загружена")
+        if scale_factor < 2:
+            raise ValueError("Масштаб должен быть не меньше 2")
+        return self.registry.resolve(scale_factor, tier)
 
-        try:
-            self.logger.log_image_processing(len(image_data), None)
-            
-            if len(image_data) == 0:
-                raise ValueError("Получены пустые данные изображения")
-            
-            image_bytes = io.BytesIO(image_data)
-            image_bytes.seek(0)
-            
+    def _cache_key(self, image_data: bytes, scale_factor: int, options: dict, spec: ModelSpec) -> str:
+        # Фактические бэкенд и точность: при откате ONNX/int8 на torch fp32 результат другой.
+        # До первой загрузки модели - настроенные (загрузка ради версии могла бы вытеснить другую модель)
+        version = self.registry.version(spec) or f"{spec.name}:{spec.version()}:{self.backend}:{self.precision}"
+        return ResultCache.make_key(
+            image_data,
+            f"{version}:draft={self.jpeg_draft}",
+            dict(options, scale_factor=scale_factor)
+        )
+
+    async def upscale_adaptive(self, image_data: bytes, scale_factor: int = 4,
+                               options: Optional[dict] = None, tier: str = "standard",
+                               deadline: Optional[Deadline] = None) -> tuple:
+        """
+        Увеличение с учетом нагрузки: (результат, уровень качества ответа).
+
+        Если политика деградации считает, что полный проход не уложится в цель
+        по задержке или в оставшийся срок запроса, или очередь инференса
+        переполнена, отдается готовый результат
+        из кэша либо упрощенный (bicubic или более легкая модель).
+        """
+        # Деградация не должна обходить проверки запроса
+        spec = self._resolve_request(scale_factor, tier)
+        if self.replicas is not None and spec.name == self.replicas.spec.name:
+            load = self.replicas
+        else:
+            load = self.pool
+        remaining = deadline.remaining() if deadline is not None else None
+        reason = self.degrade.reason(load.estimated_latency(self._input_pixels(image_data)), load.queued, remaining)
+        if reason is None:
             try:
-                img = Image.open(image_bytes)
-                img = img.convert('RGB')
-                self.logger.debug(f"Image opened: format={img.format}, mode={img.mode}")
-            except Exception as img_error:
-                self.logger.log_error(img_error, "image_opening")
-                raise
-            
-            img_array = np.array(img)
-            self.logger.debug(f"Image converted to array: shape={img_array.shape}")
-            
-            if img_array.shape[0] > 500 or img_array.shape[1] > 500:
-                raise ValueError("Большое изображение")
-
-            # Остальной код без изменений
-            pre_image = await self.preprocessing(img_array)
-            
-            with torch.no_grad():
-                SR_image = self.model(pre_image)
-            
-            SR_image = await self.postprocessing(SR_image)
-            
-            result_img = Image.fromarray((SR_image * 255).astype(np.uint8))
-            buffer = io.BytesIO()
-            result_img.save(buffer, format="PNG")
-            img_str = base64.b64encode(buffer.getvalue()).decode("utf-8")
-            
-            return img_str
+                result = await self.upscale_image_bytes(image_data, scale_factor, options, tier, deadline=deadline)
+                return result, spec.tier
+            except QueueFullError:
+                if not self.degrade.enabled:
+                    raise
+                reason = "queue_full"
+        return await self._fallback(
+            image_data, scale_factor, options or image_encoding.output_options(), spec, reason, deadline
+        )
+
+    async def _fallback(self, image_data: bytes, scale_factor: int, options: dict,
+                        spec: ModelSpec, reason: str, deadline: Optional[Deadline] = None) -> tuple:
+        """Упрощенный ответ под нагрузкой (готовый полный результат из кэша предпочтительнее)"""
+        cached = self.cache.peek(self._cache_key(image_data, scale_factor, options, spec))
+        if cached is not None:
+            return cached, spec.tier
+
+        self.degrade.record(reason)
+        if self.degrade.fallback != BICUBIC:
+            light = self.registry.resolve(scale_factor, self.degrade.fallback)
+            if light.tier == self.degrade.fallback and light.name != spec.name:
+                try:
+                    result = await self.upscale_image_bytes(
+                        image_data, scale_factor, options, light.tier, deadline=deadline
+                    )
+                    METRICS.fallbacks.inc(reason=reason, quality_tier=light.tier)
+                    return result, light.tier
+                except QueueFullError:
+                    # Легкая модель тоже перегружена - остается интерполяция
+                    pass
+
+        # Отдельный ограниченный пул: при перегрузке и он отвечает QueueFullError (503)
+        with METRICS.time("fallback"):
+            result = await self.fallback_pool.run(self._bicubic, image_data, scale_factor, options)
+        METRICS.fallbacks.inc(reason=reason, quality_tier=BICUBIC)
+        return result, BICUBIC
+
+    def _bicubic(self, image_data: bytes, scale_factor: int, options: dict) -> bytes:
+        """Бикубическое увеличение без нейросети (в пуле fallback_pool, вне пула инференса)"""
+        img, _ = self._open_image(image_data)
+        result_img = img.resize((img.width * scale_factor, img.height * scale_factor), Image.BICUBIC)
+        METRICS.output_pixels.observe(result_img.width * result_img.height)
+        return image_encoding.encode(result_img, options)
+
+    async def _process(self, image_data: bytes, scale_factor: int, options: dict,
+                       spec: ModelSpec, progress=None, deadline: Optional[Deadline] = None) -> Optional[bytes]:
+        """Полный цикл обработки: декодирование, инференс, кодирование"""
+        pixels = self._input_pixels(image_data)
+        try:
+            if self.replicas is not None and spec.name == self.replicas.spec.name:
+                return await self.replicas.run(image_data, scale_factor, options, deadline, pixels)
+
+            async with self.registry.use(spec) as entry:
+                # Запрос допускается в очередь один раз и держит место на всех этапах
+                with self.pool.admit() as admission:
+                    if self.batcher is None:
+                        result = await self.pool.run_admitted(
+                            admission, self._upscale_sync, image_data, scale_factor, options, entry, progress, deadline
+                        )
+                        if result is not None:
+                            self.pool.latency.observe(admission.service, pixels)
+                        return result
+
+                    pre_image, output_size = await self.pool.run_admitted(
+                        admission, self._decode_checked, image_data, scale_factor, spec, deadline
+                    )
+                    if self._needs_tiling(pre_image):
+                        on_tile = self._tile_callback(progress, deadline)
+                        SR_image = await self.pool.run_admitted(admission, self.forward, pre_image, entry.backend, on_tile)
+                    else:
+                        SR_image = await self.batcher.submit(
+                            pre_image, group=spec.name, deadline=deadline, admission=admission
+                        )
+                        # Батчевый проход идет без тайлов - прогресс сразу полный
+                        if progress is not None:
+                            progress(1, 1)
+                    checkpoint(deadline, "encode")
+                    result = await self.pool.run_admitted(admission, self.encode_image, SR_image, options, output_size)
+                    self.pool.latency.observe(admission.service, pixels)
+                    return result
+        except (QueueFullError, ValueError, RequestCancelled):
+            raise
         except Exception as e:
             self.logger.log_error(e, "upscale_image")
             return None
 
-    async def postprocessing(self, SR_image):
-        SR_image = SR_image.squeeze(0).permute(1, 2, 0).cpu().numpy()
-        SR_image= np.clip(SR_image, -1, 1)
-        SR_image = SR_image * 0.5 + 0.5
+    @staticmethod
+    def _input_pixels(image_data: bytes) -> int:
+        """Число пикселей входа по заголовку (0, если формат не распознан - ошибку даст обработка)"""
+        try:
+            width, height = Image.open(io.BytesIO(image_data)).size
+        except Exception:
+            return 0
+        return width * height
+
+    def _upscale_sync(self, image_data: bytes, scale_factor: int, options: dict,
+                      entry: LoadedModel, progress=None, deadline: Optional[Deadline] = None) -> Optional[bytes]:
+        """Синхронная часть обработки, выполняется в пуле инференса"""
+        try:
+            pre_image, output_size = self._decode_checked(image_data, scale_factor, entry.spec, deadline)
+            SR_image = self.forward(pre_image, entry.backend, self._tile_callback(progress, deadline))
+            checkpoint(deadline, "encode")
+            return self.encode_image(SR_image, options, output_size)
+        except (ValueError, RequestCancelled):
+            # Некорректный вход - ошибка клиента, а не сбой обработки
+            raise
+        except Exception as e:
+            self.logger.log_error(e, "upscale_image")
+            return None
+
+    def _decode_checked(self, image_data: bytes, scale_factor: int, spec: ModelSpec,
+                        deadline: Optional[Deadline]) -> tuple:
+        # Запрос, отмененный за время ожидания в очереди, не декодируется
+        checkpoint(deadline, "queued")
+        decoded = self.decode_for(image_data, scale_factor, spec)
+        checkpoint(deadline, "decode")
+        return decoded
+
+    @staticmethod
+    def _tile_callback(progress, deadline: Optional[Deadline]):
+        """Обратный вызов после тайла: прогресс и проверка срока между тайлами"""
+        if deadline is None:
+            return progress
+
+        def on_tile(done: int, total: int):
+            if progress is not None:
+                progress(done, total)
+            if done < total:
+                deadline.check("forward")
+
+        return on_tile
+
+    def decode_for(self, image_data: bytes, scale_factor: int, spec: ModelSpec) -> tuple:
+        """
+        Декодирование входа под выбранную модель: тензор и размер (ширина, высота),
+        до которого уменьшается выход, либо None, если уменьшение не нужно.
+        """
+        draft_scale = spec.scale // scale_factor if self.jpeg_draft else 1
+        pre_image, (width, height) = self._decode(image_data, draft_scale)
+        output_size = (width * scale_factor, height * scale_factor)
+        if (pre_image.shape[-1] * spec.scale, pre_image.shape[-2] * spec.scale) == output_size:
+            return pre_image, None
+        return pre_image, output_size
+
+    def decode_image(self, image_data: bytes) -> torch.Tensor:
+        """Декодирование байтов изображения и подготовка входного тензора"""
+        return self._decode(image_data)[0]
+
+    def _decode(self, image_data: bytes, draft_scale: int = 1) -> tuple:
+        """Декодирование в входной тензор; возвращает тензор и исходный размер (ширина, высота)"""
+        with METRICS.time("decode"):
+            img, original_size = self._open_image(image_data, draft_scale)
+            img_array = np.asarray(img)
+        self.logger.log_image_processing(len(image_data), img_array.shape)
+        METRICS.input_pixels.observe(img_array.shape[0] * img_array.shape[1])
+
+        with METRICS.time("preprocessing"):
+            return self.preprocessing(img_array), original_size
 
-        SR_image = np.clip(SR_image, 0, 1)
+    def _open_image(self, image_data: bytes, draft_scale: int = 1) -> tuple:
+        """
+        Открытие изображения RGB с проверкой размеров по заголовку до распаковки пикселей.
+
+        draft_scale > 1 - уменьшенное декодирование JPEG средствами декодера (в 2/4/8 раз).
+        Возвращает изображение и исходный размер (ширина, высота).
+        """
+        if len(image_data) == 0:
+            raise ValueError("Получены пустые данные изображения")
+
+        # Image.open читает только заголовок, пиксели декодируются позже
+        try:
+            img = Image.open(io.BytesIO(image_data))
+        except Image.DecompressionBombError as e:
+            raise ImageTooLargeError("Большое изображение") from e
+        except UnidentifiedImageError as e:
+            raise ValueError("Не удалось распознать формат изображения") from e
+        original_size = img.size
+        self.logger.sampled_debug("Image opened", format=img.format, mode=img.mode, size=img.size)
+
+        if draft_scale > 1 and img.format == "JPEG":
+            img.draft("RGB", (math.ceil(img.width / draft_scale), math.ceil(img.height / draft_scale)))
+        if img.width > self.max_image_side or img.height > self.max_image_side:
+            raise ImageTooLargeError("Большое изображение")
+
+        try:
+            # convert() всегда создает копию, поэтому вызываем его только при необходимости
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            else:
+                img.load()
+        except Exception as img_error:
+            self.logger.log_error(img_error, "image_opening")
+            raise
+        return img, original_size
+
+    def forward(self, pre_image: torch.Tensor, backend=None, progress=None, batched: bool = False) -> torch.Tensor:
+        """
+        Прогон генератора без градиентов (по умолчанию - модель по умолчанию).
+        Одиночное изображение при тайлинге возвращается сразу как HWC uint8,
+        батч (batched=True) - как float-тензор для нарезки по запросам.
+        """
+        grad_context = torch.inference_mode() if self.use_inference_mode else torch.no_grad()
+        with METRICS.time("forward"), grad_context:
+            return self.run_model(pre_image, backend or self.model, progress, batched)
+
+    def encode_image(self, SR_image: torch.Tensor, options: Optional[dict] = None,
+                     output_size: Optional[tuple] = None) -> bytes:
+        """Постобработка выхода генератора и кодирование (по умолчанию PNG)"""
+        with METRICS.time("postprocessing"):
+            SR_image = self.postprocessing(SR_image)
+
+            result_img = Image.fromarray(SR_image)
+            if output_size is not None:
+                result_img = result_img.resize(output_size, Image.LANCZOS)
+        METRICS.output_pixels.observe(result_img.width * result_img.height)
+
+        with METRICS.time("encode"):
+            return image_encoding.encode(result_img, options or image_encoding.output_options())
+
+    def _needs_tiling(self, pre_image: torch.Tensor) -> bool:
+        return self.tile_size > 0 and max(pre_image.shape[-2:]) > self.tile_size
+
+    async def _run_batch(self, tensors: list, size: tuple, group: str, admissions: list) -> torch.Tensor:
+        """Батчевый прогон генератора для планировщика микробатчей (group - имя модели)"""
+        # Модель захвачена ожидающими запросами и не может быть вытеснена
+        backend = self.registry.loaded[group].backend
+        # Запросы батча уже допущены в очередь, батчевый проход не отклоняется
+        return await self.pool.run_shared(admissions, self._forward_batch, tensors, size, backend)
+
+    def _forward_batch(self, tensors: list, size: tuple, backend) -> torch.Tensor:
+        return self.forward(collate(tensors, size), backend, batched=True)
+
+    def run_model(self, pre_image: torch.Tensor, backend, progress=None, batched: bool = False) -> torch.Tensor:
+        """Прогон генератора целиком или по тайлам в зависимости от размера входа"""
+        if self.tile_size > 0 and not batched and pre_image.shape[0] == 1:
+            # Выход собирается сразу в uint8, без полноразмерных float-буферов
+            return tiled_forward_uint8(backend, pre_image, self.tile_size, self.tile_overlap, progress)
+        if self.tile_size > 0:
+            return tiled_forward(backend, pre_image, self.tile_size, self.tile_overlap, progress)
+        SR_image = backend(pre_image)
+        if progress is not None:
+            progress(1, 1)
+        return SR_image
+
+    def postprocessing(self, SR_image):
+        if SR_image.dtype == torch.uint8:
+            # Тайловый инференс уже вернул HWC uint8
+            return SR_image.numpy()
+        # Выход генератора [-1, 1] -> uint8 HWC за один проход
+        SR_image = self.transform.to_uint8(SR_image)
 
         # SR_image = cv2.bilateralFilter(SR_image, d=3, sigmaColor=75, sigmaSpace=75)
         return SR_image
     
-    async def preprocessing(self, low_image):
+    def preprocessing(self, low_image):
         # Преобразуем изображение с помощью albumentations
         #low_transform = await self.transform.get_lowres_transform(low_image.shape)
         #preproc_image = low_transform(image=low_image)["image"]
 
-        preproc_image = self.transform.original_transform(image=low_image)["image"]
-        # Добавляем batch dimension и перемещаем на устройство (GPU/CPU)
-        preproc_image = preproc_image.unsqueeze(0).to(self.device)
+        # Нормализация в [0, 1], batch dimension и перенос на устройство (GPU/CPU)
+        preproc_image = self.transform.to_tensor(low_image, self.device)
 
         return preproc_image
         
+    def backend_stats(self) -> dict:
+        """
+        Настроенный и фактический бэкенд модели по умолчанию: ONNX и пониженная
+        точность при ошибке экспорта или расхождении откатываются на torch fp32.
+        """
+        model = self.model
+        return {
+            "configured": self.backend,
+            "configured_precision": self.precision,
+            "effective": model.name if model is not None else None,
+            "precision": model.precision if model is not None else None,
+        }
+
     def is_ready(self) -> bool:
         """Проверка готовности модели"""
         return self.ready 
\ No newline at end of file
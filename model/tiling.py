@@ -0,0 +1,152 @@
+import torch
+
+
+def _tile_starts(length: int, tile_size: int, stride: int) -> list:
+    """Начальные координаты тайлов вдоль одной оси (последний тайл прижат к краю)"""
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, stride))
+    starts.append(length - tile_size)
+    return starts
+
+
+def _feather_ramp(length: int, ramp: int, fade_start: bool, fade_end: bool, device) -> torch.Tensor:
+    """Одномерная весовая маска: линейный спад на внутренних краях тайла"""
+    weights = torch.ones(length, device=device)
+    ramp = min(ramp, length // 2)
+    if ramp <= 0:
+        return weights
+    values = (torch.arange(ramp, device=device, dtype=torch.float32) + 0.5) / ramp
+    if fade_start:
+        weights[:ramp] = values
+    if fade_end:
+        weights[-ramp:] = values.flip(0)
+    return weights
+
+
+def tiled_forward(model, x: torch.Tensor, tile_size: int, overlap: int, on_tile=None) -> torch.Tensor:
+    """
+    Инференс генератора по перекрывающимся тайлам с плавным смешиванием швов.
+
+    Пиковая память активаций ограничена размером тайла, а не всего изображения.
+    Масштаб выхода определяется по первому обработанному тайлу.
+    on_tile(done, total) вызывается после каждого тайла.
+    """
+    _, _, height, width = x.shape
+    if height <= tile_size and width <= tile_size:
+        output = model(x)
+        if on_tile is not None:
+            on_tile(1, 1)
+        return output
+
+    overlap = max(0, min(overlap, tile_size // 2))
+    stride = tile_size - overlap
+    ys = _tile_starts(height, tile_size, stride)
+    xs = _tile_starts(width, tile_size, stride)
+    total = len(ys) * len(xs)
+    done = 0
+
+    output = None
+    weight = None
+    scale = None
+
+    for y0 in ys:
+        y1 = min(y0 + tile_size, height)
+        for x0 in xs:
+            x1 = min(x0 + tile_size, width)
+            sr_tile = model(x[:, :, y0:y1, x0:x1])
+
+            if output is None:
+                scale = sr_tile.shape[-1] // (x1 - x0)
+                output = sr_tile.new_zeros(sr_tile.shape[0], sr_tile.shape[1], height * scale, width * scale)
+                weight = sr_tile.new_zeros(height * scale, width * scale)
+
+            ramp = overlap * scale
+            mask_y = _feather_ramp(sr_tile.shape[-2], ramp, y0 > 0, y1 < height, sr_tile.device)
+            mask_x = _feather_ramp(sr_tile.shape[-1], ramp, x0 > 0, x1 < width, sr_tile.device)
+            mask = mask_y[:, None] * mask_x[None, :]
+
+            oy0, oy1 = y0 * scale, y1 * scale
+            ox0, ox1 = x0 * scale, x1 * scale
+            output[:, :, oy0:oy1, ox0:ox1].add_(sr_tile * mask)
+            weight[oy0:oy1, ox0:ox1].add_(mask)
+            del sr_tile
+            done += 1
+            if on_tile is not None:
+                on_tile(done, total)
+
+    return output.div_(weight)
+
+
+def _to_uint8(image: torch.Tensor) -> torch.Tensor:
+    """CxHxW в [-1, 1] -> HxWxC uint8 (то же отображение, что и Transforms.to_uint8)"""
+    return image.clamp_(-1.0, 1.0).add_(1.0).mul_(127.5).permute(1, 2, 0).to(torch.uint8)
+
+
+def tiled_forward_uint8(model, x: torch.Tensor, tile_size: int, overlap: int, on_tile=None) -> torch.Tensor:
+    """
+    Тайловый инференс одного изображения (1xCxHxW) сразу в выход HxWxC uint8.
+
+    Смешивание тайлов ведется во float-полосе высотой в один ряд тайлов:
+    строки, которые следующий ряд уже не перекрывает, нормируются и
+    переводятся в uint8, а перекрытие переносится в полосу следующего ряда.
+    Пиковая память - uint8-выход и одна полоса вместо полноразмерных
+    float-буферов выхода и весов.
+    """
+    _, _, height, width = x.shape
+    if height <= tile_size and width <= tile_size:
+        output = model(x)
+        if on_tile is not None:
+            on_tile(1, 1)
+        return _to_uint8(output[0])
+
+    overlap = max(0, min(overlap, tile_size // 2))
+    stride = tile_size - overlap
+    ys = _tile_starts(height, tile_size, stride)
+    xs = _tile_starts(width, tile_size, stride)
+    total = len(ys) * len(xs)
+    done = 0
+
+    result = None
+    scale = None
+    carry = None
+
+    for row, y0 in enumerate(ys):
+        y1 = min(y0 + tile_size, height)
+        band = None
+        for x0 in xs:
+            x1 = min(x0 + tile_size, width)
+            sr_tile = model(x[:, :, y0:y1, x0:x1])[0]
+
+            if band is None:
+                if result is None:
+                    scale = sr_tile.shape[-1] // (x1 - x0)
+                    result = torch.empty(height * scale, width * scale, sr_tile.shape[0], dtype=torch.uint8)
+                band = sr_tile.new_zeros(sr_tile.shape[0], (y1 - y0) * scale, width * scale)
+                band_weight = sr_tile.new_zeros((y1 - y0) * scale, width * scale)
+                if carry is not None:
+                    # Перекрытие с предыдущим рядом тайлов
+                    band[:, :carry[0].shape[1]] = carry[0]
+                    band_weight[:carry[1].shape[0]] = carry[1]
+
+            ramp = overlap * scale
+            mask_y = _feather_ramp(sr_tile.shape[-2], ramp, y0 > 0, y1 < height, sr_tile.device)
+            mask_x = _feather_ramp(sr_tile.shape[-1], ramp, x0 > 0, x1 < width, sr_tile.device)
+            mask = mask_y[:, None] * mask_x[None, :]
+
+            ox0, ox1 = x0 * scale, x1 * scale
+            band[:, :, ox0:ox1].add_(sr_tile * mask)
+            band_weight[:, ox0:ox1].add_(mask)
+            del sr_tile
+            done += 1
+            if on_tile is not None:
+                on_tile(done, total)
+
+        # Строки до начала следующего ряда тайлов окончательны
+        top = y0 * scale
+        bottom = ys[row + 1] * scale if row + 1 < len(ys) else height * scale
+        final = bottom - top
+        result[top:bottom] = _to_uint8(band[:, :final].div_(band_weight[:final]))
+        carry = (band[:, final:], band_weight[final:])
+
+    return result
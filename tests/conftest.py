@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# Тесты запускаются из корня репозитория без установки пакета
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("NO_ALBUMENTATIONS_UPDATE", "1")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def log_dir(tmp_path_factory):
+    """Логи сервера пишутся во временный каталог, а не в logs/ рабочего каталога"""
+    path = tmp_path_factory.mktemp("logs")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("SRGAN_LOG_DIR", str(path))
+        yield path
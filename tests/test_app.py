@@ -0,0 +1,35 @@
+import asyncio
+import pytest
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    from benchmarks.serving import build_app
+
+    monkeypatch.setenv("SRGAN_JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setenv("SRGAN_CACHE_DIR", "")
+    app = build_app(str(tmp_path))
+    yield app
+    app.srgan.pool.shutdown()
+    app.srgan.fallback_pool.shutdown()
+
+
+def test_cache_key_does_not_load_model(app):
+    srgan = app.srgan
+    spec = srgan.registry.default_spec
+    del srgan.registry.loaded[spec.name]
+
+    key = srgan._cache_key(b"image", 4, {"format": "png"}, spec)
+    assert key
+    assert spec.name not in srgan.registry.loaded
+    assert srgan.registry.loads == 0
+
+
+def test_cleanup_without_default_model_stops_pools(app):
+    srgan = app.srgan
+    srgan.registry.loaded.clear()
+
+    asyncio.run(app.cleanup())
+    assert srgan.pool.executor._shutdown
+    assert srgan.fallback_pool.executor._shutdown
+    assert not srgan.ready
@@ -0,0 +1,37 @@
+import pytest
+import torch
+from model.backends import export_onnx, parity_error
+from model.generator import Generator
+
+ort = pytest.importorskip("onnxruntime")
+
+
+@pytest.fixture(scope="module")
+def generator():
+    torch.manual_seed(0)
+    return Generator(num_channels=8, num_blocks=2).eval()
+
+
+@pytest.fixture(scope="module")
+def onnx_backend(generator, tmp_path_factory):
+    from model.backends import OnnxBackend
+
+    onnx_path = str(tmp_path_factory.mktemp("onnx") / "generator.onnx")
+    export_onnx(generator, onnx_path)
+    return OnnxBackend(onnx_path, num_threads=1)
+
+
+def test_onnx_matches_torch(generator, onnx_backend):
+    assert onnx_backend.name == "onnx"
+    assert parity_error(generator, onnx_backend) < 1e-4
+
+
+def test_onnx_dynamic_shapes(generator, onnx_backend):
+    # Экспорт с примером 64x64, вход другого размера и батч из двух
+    x = torch.rand(2, 3, 20, 36)
+    with torch.no_grad():
+        expected = generator(x)
+    actual = onnx_backend(x)
+    assert actual.shape == expected.shape
+    assert torch.allclose(actual, expected, atol=1e-4)
+
@@ -0,0 +1,94 @@
+import asyncio
+import base64
+import io
+import json
+import tempfile
+import zipfile
+import numpy as np
+import pytest
+from PIL import Image
+
+
+def png(size: int = 12, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def archive(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    from benchmarks.serving import build_app
+
+    workdir = tmp_path_factory.mktemp("serving")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("SRGAN_JOBS_DIR", str(workdir / "jobs"))
+        patch.setenv("SRGAN_CACHE_DIR", "")
+        patch.setenv("SRGAN_BATCH_CONCURRENCY", "1")
+        app = build_app(str(workdir))
+    yield app
+    app.srgan.pool.shutdown()
+    app.srgan.fallback_pool.shutdown()
+
+
+@pytest.fixture(scope="module")
+def client(server):
+    from fastapi.testclient import TestClient
+
+    return TestClient(server.app)
+
+
+def test_batch_streams_files_and_zip_members(client):
+    files = [
+        ("files", ("a.png", png(seed=1), "image/png")),
+        ("files", ("pack.zip", archive({"b.png": png(seed=2), "c.png": png(seed=3), "notes.txt": b"x"}),
+                   "application/zip")),
+    ]
+    response = client.post("/upscale/batch", files=files, data={"scale_factor": "4"})
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["filename"] for line in lines) == ["a.png", "b.png", "c.png"]
+    assert all(line["status"] == "success" for line in lines)
+    image = Image.open(io.BytesIO(base64.b64decode(lines[0]["image"])))
+    assert image.size == (48, 48)
+
+
+def test_batch_rejects_non_image_files(client):
+    response = client.post("/upscale/batch", files=[("files", ("a.txt", b"text", "text/plain"))])
+    assert response.status_code == 400
+
+
+def test_batch_rejects_broken_zip(client):
+    response = client.post("/upscale/batch", files=[("files", ("a.zip", b"not a zip", "application/zip"))])
+    assert response.status_code == 400
+
+
+def test_completed_batch_is_not_marked_disconnected(server):
+    from model.deadline import Deadline
+    from utils import image_encoding
+
+    workdir = tempfile.TemporaryDirectory()
+    sources = []
+    for index in range(3):
+        path = f"{workdir.name}/{index}.png"
+        with open(path, "wb") as f:
+            f.write(png(seed=index))
+        sources.append((f"{index}.png", path, None))
+    deadline = Deadline()
+
+    async def consume():
+        stream = server.stream_batch(workdir, sources, 4, image_encoding.output_options(), "standard", deadline)
+        return [json.loads(line) async for line in stream]
+
+    lines = asyncio.run(consume())
+    assert [line["status"] for line in lines] == ["success"] * 3
+    assert deadline.reason() is None
@@ -0,0 +1,30 @@
+import zipfile
+import pytest
+from utils.batch_input import list_zip, read_item
+
+
+def write_zip(path, files: dict):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+
+
+def test_list_zip_skips_non_images_and_checks_total(tmp_path):
+    path = tmp_path / "batch.zip"
+    write_zip(path, {"a.png": b"a" * 100, "b.jpg": b"b" * 100, "readme.txt": b"x", "__MACOSX/c.png": b"c"})
+
+    assert [info.filename for info in list_zip(str(path), 10)] == ["a.png", "b.jpg"]
+    with pytest.raises(ValueError):
+        list_zip(str(path), 10, max_total_bytes=150)
+    with pytest.raises(ValueError):
+        list_zip(str(path), 1)
+
+
+def test_read_item_stops_inflating_at_limit(tmp_path):
+    path = tmp_path / "bomb.zip"
+    write_zip(path, {"bomb.png": b"\0" * (1024 * 1024)})
+    member = list_zip(str(path), 10)[0]
+
+    with pytest.raises(ValueError):
+        read_item(str(path), member, max_bytes=64 * 1024, chunk_size=16 * 1024)
+    assert len(read_item(str(path), member)) == 1024 * 1024
@@ -0,0 +1,26 @@
+import asyncio
+import torch
+from model.batcher import BatchScheduler
+from model.deadline import Deadline, RequestCancelled, EXPIRED
+
+
+def test_expired_request_is_skipped_before_batch():
+    batches = []
+
+    async def run_batch(tensors, size, group, admissions):
+        batches.append(len(tensors))
+        return torch.cat(tensors, dim=0)
+
+    async def scenario():
+        batcher = BatchScheduler(run_batch, max_batch_size=4, max_wait_ms=20.0, bucket_policy="exact")
+        expired = Deadline()
+        expired.expires_at = 0.0
+        alive = batcher.submit(torch.zeros(1, 3, 4, 4))
+        late = batcher.submit(torch.zeros(1, 3, 4, 4), deadline=expired)
+        return batcher, await asyncio.gather(alive, late, return_exceptions=True)
+
+    batcher, (alive, late) = asyncio.run(scenario())
+    assert batches == [1]
+    assert alive.shape == (1, 3, 4, 4)
+    assert isinstance(late, RequestCancelled) and late.reason == EXPIRED
+    assert batcher.stats()["skipped"] == 1
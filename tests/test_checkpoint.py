@@ -0,0 +1,102 @@
+import asyncio
+import os
+import pytest
+import torch
+from model import srgan_wrapper
+from model.checkpoint import parse_shapes
+from model.registry import ModelSpec
+
+
+@pytest.fixture
+def wrapper(tmp_path, monkeypatch):
+    monkeypatch.setenv("SRGAN_WARMUP_SHAPES", "8x8,16x12")
+    monkeypatch.setenv("SRGAN_FOLD_BN", "false")
+    monkeypatch.setenv("SRGAN_CACHE_DIR", "")
+    wrapper = srgan_wrapper.SRGANWrapper()
+    # Небольшой генератор вместо модели по умолчанию
+    spec = wrapper.registry.default_spec
+    spec.path = str(tmp_path / "gen_and_disc.pth")
+    spec.url = ""
+    spec.num_blocks, spec.num_channels = 1, 8
+    yield wrapper
+    wrapper.pool.shutdown()
+    wrapper.fallback_pool.shutdown()
+
+
+def save_checkpoint(spec: ModelSpec, seed: int) -> torch.nn.Module:
+    """Полный обучающий чекпоинт: генератор, дискриминатор и состояние оптимизатора"""
+    torch.manual_seed(seed)
+    generator = spec.build().eval()
+    for module in generator.modules():
+        if isinstance(module, torch.nn.BatchNorm2d):
+            module.running_mean.uniform_(-0.1, 0.1)
+            module.running_var.uniform_(0.5, 1.5)
+    torch.save({
+        "generator_state_dict": generator.state_dict(),
+        "discriminator_state_dict": {"weight": torch.rand(4, 4)},
+        "optimizer_state_dict": {"step": 1},
+    }, spec.path)
+    return generator
+
+
+def test_weights_are_extracted_once_per_checkpoint_version(wrapper, monkeypatch):
+    spec = wrapper.registry.default_spec
+    extracted = []
+    original = srgan_wrapper.extract_generator_weights
+    monkeypatch.setattr(srgan_wrapper, "extract_generator_weights",
+                        lambda *args: extracted.append(args[1]) or original(*args))
+
+    save_checkpoint(spec, seed=0)
+    wrapper._build_model(spec)
+    wrapper._build_model(spec)
+    assert len(extracted) == 1
+    assert os.path.exists(extracted[0])
+
+    # Новый чекпоинт - новая версия и новый файл весов
+    save_checkpoint(spec, seed=1)
+    os.utime(spec.path, (0, os.path.getmtime(spec.path) + 10))
+    wrapper._build_model(spec)
+    assert len(extracted) == 2
+    assert extracted[1] != extracted[0]
+
+
+def test_meta_device_load_matches_legacy_load(wrapper):
+    spec = wrapper.registry.default_spec
+    save_checkpoint(spec, seed=0)
+
+    legacy = spec.build()
+    legacy.load_state_dict(torch.load(spec.path, map_location="cpu", weights_only=False)["generator_state_dict"])
+    legacy.eval()
+
+    x = torch.rand(1, 3, 12, 10)
+    with torch.no_grad():
+        expected = legacy(x)
+        # Первый раз - извлечение, второй - загрузка весов с отображением в память
+        for _ in range(2):
+            entry = wrapper._build_model(spec)
+            assert not any(t.is_meta for t in entry.backend.model.state_dict().values())
+            assert torch.equal(entry.backend.model(x), expected)
+
+
+def test_boot_warms_up_configured_shapes(wrapper, monkeypatch):
+    spec = wrapper.registry.default_spec
+    save_checkpoint(spec, seed=0)
+    shapes = []
+    original = wrapper.forward
+    monkeypatch.setattr(wrapper, "forward", lambda x, *args: shapes.append(tuple(x.shape[-2:])) or original(x, *args))
+
+    assert asyncio.run(wrapper.load_model())
+    assert shapes == [(8, 8), (16, 12)]
+    assert wrapper.ready
+    assert wrapper.boot_to_ready > 0
+
+
+@pytest.mark.parametrize("value", ["64", "64x", "axb", "64x64x3", "0x64", "64x-8"])
+def test_warmup_shapes_reject_bad_input(value):
+    with pytest.raises(ValueError):
+        parse_shapes(value)
+
+
+def test_warmup_shapes_parsing():
+    assert parse_shapes(" 64x64, 128X96 ,") == [(64, 64), (128, 96)]
+    assert parse_shapes("") == []
@@ -0,0 +1,87 @@
+import asyncio
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from model.degrade import BICUBIC, DegradePolicy, LatencyEstimator
+
+
+def png(size: int = 10) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(np.zeros((size, size, 3), dtype=np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def srgan(tmp_path, monkeypatch):
+    from benchmarks.serving import build_app
+
+    monkeypatch.setenv("SRGAN_JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setenv("SRGAN_CACHE_DIR", "")
+    wrapper = build_app(str(tmp_path)).srgan
+    # Политика всегда требует деградации
+    wrapper.degrade = DegradePolicy(fallback=BICUBIC)
+    monkeypatch.setattr(wrapper.degrade, "reason", lambda *args: "latency")
+    yield wrapper
+    wrapper.pool.shutdown()
+    wrapper.fallback_pool.shutdown()
+
+
+def test_bicubic_fallback(srgan):
+    result, tier = asyncio.run(srgan.upscale_adaptive(png(), 4))
+    assert tier == BICUBIC
+    assert Image.open(io.BytesIO(result)).size == (40, 40)
+    assert srgan.fallback_pool.stats()["completed"] == 1
+
+
+def test_fallback_does_not_bypass_validation(srgan):
+    with pytest.raises(ValueError):
+        asyncio.run(srgan.upscale_adaptive(png(), 1))
+
+    srgan.ready = False
+    with pytest.raises(RuntimeError):
+        asyncio.run(srgan.upscale_adaptive(png(), 4))
+
+
+def test_estimate_scales_with_input_pixels():
+    estimator = LatencyEstimator(window_sec=60.0)
+    estimator.observe(6.0, 200 * 200)
+
+    assert estimator.estimate(200 * 200, ahead=0, workers=1) == pytest.approx(6.0)
+    assert estimator.estimate(8 * 8, ahead=0, workers=1) < 0.01
+    # Впереди один средний запрос
+    assert estimator.estimate(8 * 8, ahead=1, workers=1) == pytest.approx(6.0, rel=0.01)
+
+
+def test_estimate_recovers_after_window():
+    now = [0.0]
+    estimator = LatencyEstimator(window_sec=10.0)
+    estimator.clock = lambda: now[0]
+    estimator.observe(6.0, 100)
+    assert estimator.estimate(100, 0, 1) == pytest.approx(6.0)
+
+    now[0] = 11.0
+    assert estimator.estimate(100, 0, 1) == 0.0
+    assert estimator.stats()["samples"] == 0
+
+
+def test_small_request_is_not_degraded_after_large_one(tmp_path, monkeypatch):
+    from benchmarks.serving import build_app
+
+    monkeypatch.setenv("SRGAN_JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setenv("SRGAN_CACHE_DIR", "")
+    srgan = build_app(str(tmp_path)).srgan
+    srgan.degrade = DegradePolicy(fallback=BICUBIC, latency_target_ms=1000.0)
+    try:
+        # Тяжелый запрос 200x200 шел 6 секунд
+        srgan.pool.latency.observe(6.0, 200 * 200)
+        _, tier = asyncio.run(srgan.upscale_adaptive(png(8), 4))
+        assert tier == "standard"
+        assert srgan.pool.latency.stats()["samples"] == 2
+
+        _, tier = asyncio.run(srgan.upscale_adaptive(png(200), 4))
+        assert tier == BICUBIC
+        assert srgan.degrade.triggered == {"latency": 1}
+    finally:
+        srgan.pool.shutdown()
+        srgan.fallback_pool.shutdown()
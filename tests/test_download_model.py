@@ -0,0 +1,148 @@
+import hashlib
+import io
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from utils.download_model import fetch_artifact, verify_artifact
+
+
+def checkpoint_bytes(size: int = 64 * 1024) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("archive/data.pkl", bytes(range(256)) * (size // 256))
+    return buffer.getvalue()
+
+
+class ArtifactServer:
+    """Локальный HTTP-сервер с поддержкой Range вместо хранилища модели"""
+
+    def __init__(self, files: dict):
+        self.files = files
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append((self.path, self.headers.get("Range")))
+                data = server.files.get(self.path)
+                if data is None:
+                    self.send_error(404)
+                    return
+                status, start = 200, 0
+                byte_range = self.headers.get("Range")
+                if byte_range:
+                    start = int(byte_range[len("bytes="):].split("-")[0])
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                        self.end_headers()
+                        return
+                    status = 206
+                self.send_response(status)
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+                self.send_header("Content-Length", str(len(data) - start))
+                self.end_headers()
+                self.wfile.write(data[start:])
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+DATA = checkpoint_bytes()
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+@pytest.fixture
+def server():
+    server = ArtifactServer({"/model.pth": DATA, "/corrupt.pth": DATA[:-10] + b"0123456789"})
+    yield server
+    server.close()
+
+
+def test_resumes_partial_download_with_range(server, tmp_path):
+    path = str(tmp_path / "model.pth")
+    with open(f"{path}.part", "wb") as f:
+        f.write(DATA[:1000])
+    with open(f"{path}.part.source", "w", encoding="utf-8") as f:
+        f.write(server.url("/model.pth"))
+
+    assert fetch_artifact(path, [server.url("/model.pth")], SHA256, len(DATA))
+    assert server.requests == [("/model.pth", "bytes=1000-")]
+    assert open(path, "rb").read() == DATA
+
+
+def test_complete_part_without_known_size_recovers_from_416(server, tmp_path):
+    path = str(tmp_path / "model.pth")
+    with open(f"{path}.part", "wb") as f:
+        f.write(DATA + b"tail")
+    with open(f"{path}.part.source", "w", encoding="utf-8") as f:
+        f.write(server.url("/model.pth"))
+
+    assert fetch_artifact(path, [server.url("/model.pth")], SHA256)
+    assert server.requests == [("/model.pth", f"bytes={len(DATA) + 4}-"), ("/model.pth", None)]
+    assert open(path, "rb").read() == DATA
+
+
+def test_oversized_part_is_dropped_before_range(server, tmp_path):
+    path = str(tmp_path / "model.pth")
+    with open(f"{path}.part", "wb") as f:
+        f.write(DATA + b"tail")
+    with open(f"{path}.part.source", "w", encoding="utf-8") as f:
+        f.write(server.url("/model.pth"))
+
+    assert fetch_artifact(path, [server.url("/model.pth")], SHA256, len(DATA))
+    assert server.requests == [("/model.pth", None)]
+
+
+def test_part_from_another_source_is_not_resumed(server, tmp_path):
+    path = str(tmp_path / "model.pth")
+    with open(f"{path}.part", "wb") as f:
+        f.write(b"x" * 1000)
+    with open(f"{path}.part.source", "w", encoding="utf-8") as f:
+        f.write("https://drive.google.com/file/d/other/view")
+
+    assert fetch_artifact(path, [server.url("/model.pth")], SHA256, len(DATA))
+    assert server.requests == [("/model.pth", None)]
+
+
+def test_corrupt_download_falls_back_to_mirror(server, tmp_path):
+    path = str(tmp_path / "model.pth")
+    sources = [server.url("/missing.pth"), server.url("/corrupt.pth"), server.url("/model.pth")]
+
+    assert fetch_artifact(path, sources, SHA256, len(DATA))
+    assert [request[0] for request in server.requests] == ["/missing.pth", "/corrupt.pth", "/model.pth"]
+    assert not (tmp_path / "model.pth.part").exists()
+    assert open(path, "rb").read() == DATA
+
+
+def test_first_download_pins_checksum(server, tmp_path):
+    path = str(tmp_path / "model.pth")
+    assert fetch_artifact(path, [server.url("/model.pth")])
+    assert (tmp_path / "model.pth.sha256").read_text(encoding="utf-8") == SHA256
+
+    # Файл изменился на диске - без заданной суммы это тоже обнаруживается
+    with open(path, "r+b") as f:
+        f.seek(100)
+        f.write(b"\0")
+    assert not verify_artifact(path)
+
+
+def test_error_page_is_not_a_checkpoint(tmp_path):
+    server = ArtifactServer({"/model.pth": b"<html>quota exceeded</html>"})
+    try:
+        assert not fetch_artifact(str(tmp_path / "model.pth"), [server.url("/model.pth")])
+    finally:
+        server.close()
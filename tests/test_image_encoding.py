@@ -0,0 +1,13 @@
+import pytest
+from utils import image_encoding
+
+
+def test_output_options_defaults_for_missing_values():
+    assert image_encoding.output_options("png", None, None) == {"format": "png", "compress_level": 6}
+    assert image_encoding.output_options("jpg", None, None) == {"format": "jpeg", "quality": 90}
+
+
+@pytest.mark.parametrize("quality, compress_level", [(0, 6), (101, 6), (90, -1), (90, 10)])
+def test_output_options_rejects_out_of_range(quality, compress_level):
+    with pytest.raises(ValueError):
+        image_encoding.output_options("webp", quality, compress_level)
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+import pytest
+from model.inference_pool import InferencePool, QueueFullError
+
+
+def test_cancelled_request_holds_slot_until_task_finishes():
+    async def scenario():
+        pool = InferencePool(workers=1, max_queue=0)
+        release = threading.Event()
+        started = threading.Event()
+
+        def work():
+            started.set()
+            release.wait(5)
+            return "done"
+
+        task = asyncio.create_task(pool.run(work))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # Поток пула все еще занят: новый запрос не допускается
+        assert pool.in_flight == 1
+        with pytest.raises(QueueFullError):
+            await pool.run(lambda: None)
+
+        release.set()
+        while pool.in_flight:
+            await asyncio.sleep(0.01)
+        assert await pool.run(lambda: "next") == "next"
+        pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_shared_task_is_counted_per_image():
+    async def scenario():
+        pool = InferencePool(workers=1, max_queue=4)
+        admissions = [pool.admit() for _ in range(3)]
+        assert await pool.run_shared(admissions, lambda: time.sleep(0.03) or "batch") == "batch"
+        stats = pool.stats()
+        assert stats["completed"] == 3
+        assert stats["running"] == 0
+        # Каждый запрос получает треть времени батчевого прохода
+        shares = [admission.service for admission in admissions]
+        assert shares[0] == shares[1] == shares[2]
+        assert abs(stats["avg_service_sec"] - shares[0]) < 1e-9
+        # Место держится до конца запроса, а не батча
+        assert pool.in_flight == 3
+        for admission in admissions:
+            admission.release()
+        assert pool.in_flight == 0
+        pool.shutdown()
+
+    asyncio.run(scenario())
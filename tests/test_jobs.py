@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from model.jobs import JobLimitError, JobManager
+
+
+class SlowWrapper:
+    """Заглушка SRGANWrapper: обработка ждет сигнала"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def upscale_image_bytes(self, image_data, scale_factor, options, tier, progress=None):
+        await self.release.wait()
+        if progress is not None:
+            progress(1, 1)
+        return b"result"
+
+
+def run(scenario):
+    asyncio.run(scenario())
+
+
+def test_callbacks_disabled_without_allowlist(tmp_path):
+    jobs = JobManager(None, str(tmp_path))
+    with pytest.raises(ValueError):
+        jobs.check_callback("http://example.com/hook")
+
+
+def test_callback_allowlist(tmp_path):
+    jobs = JobManager(None, str(tmp_path), callback_hosts=["hooks.example.com"])
+    jobs.check_callback("https://hooks.example.com/done")
+    for url in ("http://169.254.169.254/latest", "ftp://hooks.example.com/", "http://hooks.example.com.evil.io/"):
+        with pytest.raises(ValueError):
+            jobs.check_callback(url)
+
+
+def test_pending_and_disk_limits(tmp_path):
+    async def scenario():
+        srgan = SlowWrapper()
+        jobs = JobManager(srgan, str(tmp_path), max_pending=2, max_disk_bytes=1000)
+        await jobs.start()
+        try:
+            options = {"format": "png", "compress_level": 6}
+            await jobs.submit(b"x" * 10, 4, options, "standard")
+            await jobs.submit(b"x" * 10, 4, options, "standard")
+            with pytest.raises(JobLimitError):
+                await jobs.submit(b"x" * 10, 4, options, "standard")
+
+            srgan.release.set()
+            while jobs.pending:
+                await asyncio.sleep(0.01)
+            with pytest.raises(JobLimitError):
+                await jobs.submit(b"x" * 1000, 4, options, "standard")
+
+            stats = await jobs.stats()
+            assert stats["stored"] == {"done": 2}
+            assert stats["rejected"] == 2
+            assert stats["disk_used_bytes"] == len(b"result") * 2
+        finally:
+            await jobs.stop()
+
+    run(scenario)
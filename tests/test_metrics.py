@@ -0,0 +1,68 @@
+import io
+import re
+import numpy as np
+from PIL import Image
+from utils.metrics import Counter, Histogram
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "help", buckets=(0.1, 1.0, 10.0))
+    for value in (0.05, 0.1, 0.5, 2.0, 20.0):
+        histogram.observe(value, stage="decode")
+
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP test_seconds help", "# TYPE test_seconds histogram"]
+    assert lines[2:] == [
+        'test_seconds_bucket{le="0.1",stage="decode"} 2',
+        'test_seconds_bucket{le="1.0",stage="decode"} 3',
+        'test_seconds_bucket{le="10.0",stage="decode"} 4',
+        'test_seconds_bucket{le="+Inf",stage="decode"} 5',
+        'test_seconds_count{stage="decode"} 5',
+        'test_seconds_sum{stage="decode"} 22.65',
+    ]
+
+
+def test_histogram_series_are_separated_by_labels():
+    histogram = Histogram("test_pixels", "help", buckets=(10,))
+    histogram.observe(5, kind="a")
+    histogram.observe(50, kind="b")
+    lines = histogram.render()
+    assert 'test_pixels_bucket{kind="a",le="10"} 1' in lines
+    assert 'test_pixels_bucket{kind="b",le="10"} 0' in lines
+    assert 'test_pixels_count{kind="b"} 1' in lines
+
+
+def test_label_values_are_escaped():
+    counter = Counter("test_total", "help")
+    counter.inc(cause='bad "input"\\path\nnext')
+    assert counter.render()[-1] == 'test_total{cause="bad \\"input\\"\\\\path\\nnext"} 1.0'
+
+
+def error_count(text: str, cause: str) -> float:
+    match = re.search(rf'^srgan_errors_total{{cause="{cause}"}} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_not_ready_503_is_counted(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from benchmarks.serving import build_app
+
+    monkeypatch.setenv("SRGAN_JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setenv("SRGAN_CACHE_DIR", "")
+    app = build_app(str(tmp_path))
+    app.ready = False
+    buffer = io.BytesIO()
+    Image.fromarray(np.zeros((8, 8, 3), dtype=np.uint8)).save(buffer, format="PNG")
+    try:
+        client = TestClient(app.app)
+        before = error_count(client.get("/metrics").text, "not_ready")
+        response = client.post("/upscale", files={"file": ("a.png", buffer.getvalue(), "image/png")})
+        assert response.status_code == 503
+
+        metrics = client.get("/metrics")
+        assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert error_count(metrics.text, "not_ready") == before + 1
+        assert "# TYPE srgan_stage_seconds histogram" in metrics.text
+    finally:
+        app.srgan.pool.shutdown()
+        app.srgan.fallback_pool.shutdown()
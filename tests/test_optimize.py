@@ -0,0 +1,49 @@
+import copy
+import pytest
+import torch
+import torch.nn as nn
+from model.generator import Generator
+from model.optimize import optimize_model
+
+
+@pytest.fixture(scope="module")
+def generator():
+    torch.manual_seed(0)
+    model = Generator(num_channels=8, num_blocks=2)
+    # Неединичная статистика BatchNorm, иначе вклеивание проверяется вырожденно
+    for module in model.modules():
+        if isinstance(module, nn.BatchNorm2d):
+            module.running_mean.uniform_(-0.1, 0.1)
+            module.running_var.uniform_(0.5, 1.5)
+            module.weight.data.uniform_(0.5, 1.5)
+            module.bias.data.uniform_(-0.1, 0.1)
+    return model.eval()
+
+
+@pytest.mark.parametrize("fold_bn", [False, True])
+@pytest.mark.parametrize("channels_last", [False, True])
+@pytest.mark.parametrize("jit", ["none", "trace"])
+def test_optimized_model_matches_eager(generator, fold_bn, channels_last, jit):
+    torch.manual_seed(1)
+    example = torch.rand(1, 3, 16, 16)
+    # Размер отличается от примера трассировки
+    x = torch.rand(2, 3, 24, 20)
+
+    optimized = optimize_model(copy.deepcopy(generator), fold_bn=fold_bn, channels_last=channels_last,
+                               jit=jit, example_input=example)
+    with torch.no_grad():
+        expected = generator(x)
+        actual = optimized(x)
+
+    assert actual.shape == expected.shape
+    assert torch.allclose(actual, expected, atol=1e-4)
+
+
+def test_fold_bn_removes_batchnorm(generator):
+    optimized = optimize_model(copy.deepcopy(generator), fold_bn=True)
+    assert not any(isinstance(module, nn.BatchNorm2d) for module in optimized.modules())
+
+
+def test_trace_requires_example_input(generator):
+    with pytest.raises(ValueError):
+        optimize_model(copy.deepcopy(generator), jit="trace")
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+import numpy as np
+import pytest
+from PIL import Image
+from benchmarks import quality
+
+
+def test_missing_or_empty_images_dir_is_an_error(tmp_path):
+    with pytest.raises(ValueError):
+        quality.test_images(16, 0, str(tmp_path / "missing"))
+    (tmp_path / "notes.txt").write_text("not an image")
+    with pytest.raises(ValueError):
+        quality.test_images(16, 0, str(tmp_path))
+
+
+def test_photos_are_real_crops(tmp_path):
+    Image.fromarray(np.full((32, 32, 3), 255, dtype=np.uint8)).save(tmp_path / "white.png")
+    images = quality.test_images(16, 0, str(tmp_path))
+    assert images["photo_0"].shape == (1, 3, 16, 16)
+    assert float(images["photo_0"].min()) == 1.0
+
+
+def test_fixture_is_committed():
+    assert os.path.exists(quality.FIXTURE_PATH)
+
+
+def run_main(monkeypatch, tmp_path, *extra) -> tuple:
+    output = tmp_path / "quality.json"
+    monkeypatch.setattr(sys, "argv", [
+        "quality", "--size", "32", "--repeats", "1", "--tile-size", "16", "--tile-overlap", "4",
+        "--paths", "fold_bn", "tiled", "int8", "--output", str(output), *extra
+    ])
+    code = 0
+    try:
+        quality.main()
+    except SystemExit as e:
+        code = e.code
+    return code, json.loads(output.read_text(encoding="utf-8"))
+
+
+def test_default_gate_passes_on_fixture(monkeypatch, tmp_path, capsys):
+    code, report = run_main(monkeypatch, tmp_path)
+    assert code == 0
+    assert report["model"] == quality.FIXTURE_PATH
+    assert {name: result["status"] for name, result in report["results"].items()} == {
+        "fold_bn": "pass", "tiled": "pass", "int8": "pass"
+    }
+    worst = report["results"]["int8"]["worst"]
+    assert set(worst) == {"psnr_db", "ssim", "max_deviation", "latency_sec", "speedup"}
+
+
+def test_gate_fails_below_threshold(monkeypatch, tmp_path, capsys):
+    thresholds = tmp_path / "thresholds.json"
+    thresholds.write_text(json.dumps({"int8": {"min_psnr": 1000.0}}), encoding="utf-8")
+    code, report = run_main(monkeypatch, tmp_path, "--thresholds", str(thresholds))
+    assert code == 1
+    assert report["results"]["int8"]["status"] == "fail"
+    assert report["results"]["fold_bn"]["status"] == "pass"
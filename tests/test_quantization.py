@@ -0,0 +1,32 @@
+import copy
+import torch
+from model.generator import Generator
+from model.quantization import calibration_samples, compare_precision, quantization_engine, quantize_int8, samples_digest
+
+
+def test_quantization_engine_is_supported():
+    assert quantization_engine() in torch.backends.quantized.supported_engines
+
+
+def test_int8_model_stays_close_to_fp32():
+    torch.manual_seed(0)
+    model = Generator(num_channels=8, num_blocks=2).eval()
+    samples = [torch.rand(1, 3, 24, 24) for _ in range(4)]
+
+    quantized = quantize_int8(copy.deepcopy(model), samples)
+    report = compare_precision(model, quantized, samples)
+
+    assert report["psnr_vs_fp32_db"] > 25.0
+
+
+def test_samples_digest_tracks_calibration_inputs(tmp_path):
+    from PIL import Image
+
+    noise = calibration_samples("", count=2, size=16)
+    assert samples_digest(noise) == samples_digest(calibration_samples("", count=2, size=16))
+    assert samples_digest(noise) != samples_digest(calibration_samples("", count=3, size=16))
+
+    Image.new("RGB", (16, 16), (255, 0, 0)).save(tmp_path / "red.png")
+    red = samples_digest(calibration_samples(str(tmp_path), count=2, size=16))
+    Image.new("RGB", (16, 16), (0, 0, 255)).save(tmp_path / "red.png")
+    assert samples_digest(calibration_samples(str(tmp_path), count=2, size=16)) != red
@@ -0,0 +1,91 @@
+import asyncio
+from model.backends import TorchBackend
+from model.registry import LoadedModel, ModelRegistry, ModelSpec
+
+
+def make_registry(memory_bytes: int, loads: list):
+    specs = [ModelSpec(name, path=f"/nonexistent/{name}.pth") for name in ("a", "b", "c")]
+
+    async def loader(spec):
+        loads.append(spec.name)
+        await asyncio.sleep(0.01)
+        return LoadedModel(spec, TorchBackend(None), 10)
+
+    return ModelRegistry(specs, loader, memory_bytes=memory_bytes), {spec.name: spec for spec in specs}
+
+
+def test_waiter_of_shared_load_survives_eviction():
+    async def scenario():
+        loads = []
+        registry, specs = make_registry(15, loads)
+        busy = await registry.acquire(specs["c"])
+        async with registry.use(specs["b"]):
+            pass
+
+        async def leader():
+            # Захват и освобождение без передачи управления: вытеснение до пробуждения ожидающего
+            async with registry.use(specs["a"]):
+                pass
+
+        async def waiter():
+            async with registry.use(specs["a"]) as entry:
+                return entry
+
+        _, entry = await asyncio.gather(leader(), waiter())
+        assert entry.spec.name == "a"
+        assert loads.count("a") == 1
+        registry.release(busy)
+
+    asyncio.run(scenario())
+
+
+def test_version_tracks_effective_backend_and_outlives_eviction():
+    async def scenario():
+        registry, specs = make_registry(10, [])
+        assert registry.version(specs["a"]) is None
+
+        async with registry.use(specs["a"]):
+            version = registry.version(specs["a"])
+        async with registry.use(specs["b"]):
+            pass
+
+        assert "a" not in registry.loaded
+        assert registry.version(specs["a"]) == version
+        assert version.endswith(":torch:fp32")
+
+    asyncio.run(scenario())
+
+
+def test_waiter_reloads_when_loading_request_is_cancelled():
+    async def scenario():
+        loads = []
+        registry, specs = make_registry(100, loads)
+        leader = asyncio.ensure_future(registry.acquire(specs["a"]))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(registry.acquire(specs["a"]))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        entry = await asyncio.wait_for(waiter, timeout=5)
+        assert leader.cancelled()
+        assert entry.spec.name == "a"
+        assert loads.count("a") == 2
+        assert not registry.loading
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_shared_load():
+    async def scenario():
+        registry, specs = make_registry(100, [])
+        leader = asyncio.ensure_future(registry.acquire(specs["a"]))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(registry.acquire(specs["a"]))
+        await asyncio.sleep(0)
+        waiter.cancel()
+
+        entry = await leader
+        assert waiter.cancelled()
+        assert entry.spec.name == "a"
+
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+import asyncio
+import io
+import time
+import numpy as np
+import pytest
+from PIL import Image
+from model.registry import ModelSpec
+from model.deadline import DISCONNECTED, RequestCancelled
+from model.replicas import ReplicaPool, _SharedDeadline, _CANCEL_CODES, _deliver, _set_result
+
+
+def png(size: int = 8) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(np.zeros((size, size, 3), dtype=np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def pool(tmp_path_factory):
+    spec = ModelSpec("small", scale=4, path=str(tmp_path_factory.mktemp("replicas") / "small.pth"),
+                     num_blocks=1, num_channels=8)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("SRGAN_WARMUP_SHAPES", "")
+        replicas = ReplicaPool(spec.build().eval(), spec, replicas=1, threads=1)
+        replicas.start(timeout=120)
+    yield replicas
+    replicas.shutdown()
+
+
+def test_invalid_input_is_a_value_error(pool):
+    async def scenario():
+        with pytest.raises(ValueError):
+            await pool.run(b"not an image", 4, {"format": "png", "compress_level": 1})
+
+    asyncio.run(scenario())
+
+
+def test_dead_replica_is_respawned(pool):
+    pool.processes[0].kill()
+    pool.processes[0].join(10)
+
+    started = time.monotonic()
+    while pool.restarts == 0 or not pool.alive[0]:
+        assert time.monotonic() - started < 120
+        time.sleep(0.2)
+
+    async def scenario():
+        return await pool.run(png(), 4, {"format": "png", "compress_level": 1})
+
+    result = asyncio.run(scenario())
+    assert Image.open(io.BytesIO(result)).size == (32, 32)
+
+
+def test_shared_flag_cancels_request_in_replica():
+    flags = bytearray(2)
+    deadline = _SharedDeadline(flags, 1, None)
+    deadline.check("tile")
+    flags[1] = _CANCEL_CODES[DISCONNECTED]
+    with pytest.raises(RequestCancelled) as error:
+        deadline.check("tile")
+    assert error.value.reason == DISCONNECTED
+
+
+def test_cancelled_request_frees_slot_on_replica_response(pool):
+    slots = len(pool.free_slots)
+
+    async def scenario():
+        task = asyncio.ensure_future(pool.run(png(256), 4, {"format": "png", "compress_level": 1}))
+        # Запрос передан реплике, ответа еще нет
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Место освобождается по ответу реплики, пока цикл запроса еще открыт
+        started = time.monotonic()
+        while pool.in_flight:
+            assert time.monotonic() - started < 60
+            await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert pool.cancelled >= 1
+    assert len(pool.free_slots) == slots
+
+
+def test_response_for_closed_loop_is_dropped():
+    loop = asyncio.new_event_loop()
+    future = loop.create_future()
+    loop.close()
+    _deliver(loop, _set_result, future, b"result")
+    assert not future.done()
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from model.deadline import RequestCancelled
+from model.result_cache import ResultCache
+
+
+def test_leader_cancellation_does_not_fail_waiters():
+    async def scenario():
+        cache = ResultCache(memory_bytes=1024)
+        release = asyncio.Event()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await release.wait()
+            return b"result"
+
+        leader = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        release.set()
+
+        assert await waiter == b"result"
+        assert calls == [1]
+        assert cache.stats()["coalesced"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_computation_cancelled_when_nobody_waits():
+    async def scenario():
+        cache = ResultCache(memory_bytes=1024)
+        cancelled = asyncio.Event()
+
+        async def compute():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        request = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert cache.in_flight == {}
+
+    asyncio.run(scenario())
+
+
+def test_waiter_recomputes_after_owner_deadline():
+    async def scenario():
+        cache = ResultCache(memory_bytes=1024)
+        started = asyncio.Event()
+
+        async def owner_compute():
+            started.set()
+            await asyncio.sleep(0.01)
+            raise RequestCancelled("expired")
+
+        async def waiter_compute():
+            return b"fresh"
+
+        owner = asyncio.create_task(cache.get_or_compute("key", owner_compute))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get_or_compute("key", waiter_compute))
+
+        with pytest.raises(RequestCancelled):
+            await owner
+        assert await waiter == b"fresh"
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+import atexit
+import logging
+import pytest
+from utils import server_logger
+from utils.server_logger import ServerLogger
+
+
+@pytest.fixture
+def records(monkeypatch):
+    logger = ServerLogger()
+    captured = []
+    monkeypatch.setattr(logger, "_log", lambda level, message, fields: captured.append(message))
+    return logger, captured
+
+
+def test_sampled_debug_respects_rate(records, monkeypatch):
+    logger, captured = records
+    logger.debug_sample_rate = 0.0
+    for _ in range(10):
+        logger.sampled_debug("skipped")
+    assert captured == []
+
+    logger.debug_sample_rate = 0.5
+    values = iter([0.1, 0.9, 0.4, 0.6])
+    monkeypatch.setattr(server_logger.random, "random", lambda: next(values))
+    for index in range(4):
+        logger.sampled_debug(f"sample {index}")
+    assert captured == ["sample 0", "sample 2"]
+
+    logger.debug_sample_rate = 1.0
+    logger.sampled_debug("always")
+    assert captured[-1] == "always"
+
+
+def test_handlers_are_configured_once_per_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(server_logger, "_listener", None)
+    logger = logging.getLogger("test_server_logger")
+    logger.setLevel(logging.DEBUG)
+
+    server_logger._configure(logger, str(tmp_path / "first"))
+    listener = server_logger._listener
+    server_logger._configure(logger, str(tmp_path / "second"))
+    try:
+        assert server_logger._listener is listener
+        assert len(logger.handlers) == 1
+        assert not (tmp_path / "second").exists()
+
+        # Запись в файл выполняет поток QueueListener
+        logger.debug("structured", extra={"fields": {"request_id": 7}})
+    finally:
+        atexit.unregister(listener.stop)
+        listener.stop()
+        logger.handlers.clear()
+
+    (log_file,) = (tmp_path / "first").iterdir()
+    assert "DEBUG - structured request_id=7" in log_file.read_text(encoding="utf-8")
+
+
+def test_default_log_dir_comes_from_environment(log_dir):
+    ServerLogger()
+    assert any(path.name.startswith("server_") for path in log_dir.iterdir())
@@ -0,0 +1,21 @@
+import json
+from benchmarks import serving
+
+
+def test_harness_writes_report_schema(tmp_path, capsys):
+    output = tmp_path / "bench.json"
+    serving.main([
+        "--sizes", "8", "--batch-sizes", "1", "2", "--serving-size", "8",
+        "--concurrency", "1", "2", "--repeats", "1", "--output", str(output)
+    ])
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert set(report) == {"environment", "args", "generator", "end_to_end", "throughput"}
+    assert set(report["generator"]) == {"8x8/b1", "8x8/b2"}
+    summary = {"mean_sec", "p50_sec", "p95_sec", "min_sec", "runs"}
+    for result in report["generator"].values():
+        assert set(result) == summary | {"images_per_sec"}
+        assert result["runs"] == 1
+    assert set(report["end_to_end"]) == summary
+    assert set(report["throughput"]) == {"1", "2"}
+    for result in report["throughput"].values():
+        assert set(result) == summary | {"requests_per_sec"}
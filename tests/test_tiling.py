@@ -0,0 +1,64 @@
+import pytest
+import torch
+from model.generator import Generator
+from model.tiling import tiled_forward, tiled_forward_uint8
+from transform.transform import Transforms
+
+
+@pytest.fixture(scope="module")
+def generator():
+    torch.manual_seed(0)
+    return Generator(num_channels=8, num_blocks=2).eval()
+
+
+@pytest.fixture(scope="module")
+def image():
+    torch.manual_seed(1)
+    # Больше одного тайла по обеим осям, последний тайл прижат к краю
+    return torch.rand(1, 3, 70, 90)
+
+
+def test_tiled_forward_matches_full_image(generator, image):
+    with torch.inference_mode():
+        expected = generator(image)
+        actual = tiled_forward(generator, image, tile_size=32, overlap=16)
+
+    assert actual.shape == expected.shape
+    assert torch.allclose(actual, expected, atol=2e-2)
+
+
+def test_tiled_forward_small_input_is_single_pass(generator):
+    x = torch.rand(1, 3, 20, 24)
+    calls = []
+    with torch.inference_mode():
+        actual = tiled_forward(generator, x, tile_size=32, overlap=8, on_tile=lambda done, total: calls.append(total))
+        expected = generator(x)
+
+    assert calls == [1]
+    assert torch.equal(actual, expected)
+
+
+def test_tiled_forward_uint8_matches_float_path(generator, image):
+    progress = []
+    with torch.inference_mode():
+        reference = Transforms().to_uint8(tiled_forward(generator, image, tile_size=32, overlap=16))
+        actual = tiled_forward_uint8(generator, image, 32, 16, lambda done, total: progress.append((done, total)))
+
+    assert actual.dtype == torch.uint8
+    assert tuple(actual.shape) == reference.shape
+    # Расхождение только из-за порядка float-операций на границе округления
+    assert (actual.int() - torch.from_numpy(reference).int()).abs().max() <= 1
+    assert progress[-1][0] == progress[-1][1] == len(progress)
+
+
+def test_tiled_forward_matches_full_size_generator():
+    # Архитектура по умолчанию: полная глубина и рецептивное поле, перекрытие как в сервисе
+    torch.manual_seed(0)
+    model = Generator().eval()
+    x = torch.rand(1, 3, 96, 120)
+    with torch.inference_mode():
+        expected = model(x)
+        actual = tiled_forward(model, x, tile_size=64, overlap=32)
+
+    assert actual.shape == expected.shape
+    assert torch.allclose(actual, expected, atol=2e-2)
@@ -0,0 +1,28 @@
+import warnings
+import numpy as np
+import torch
+from PIL import Image
+from transform.transform import Transforms
+
+
+def test_to_tensor_from_readonly_array_without_warnings():
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, size=(5, 7, 3), dtype=np.uint8)
+    img_array = np.asarray(Image.fromarray(pixels))
+    assert not img_array.flags.writeable
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        tensor = Transforms().to_tensor(img_array)
+
+    expected = torch.from_numpy(pixels).permute(2, 0, 1).unsqueeze(0).float() / 255.0
+    assert torch.allclose(tensor, expected)
+
+
+def test_to_uint8_returns_independent_arrays():
+    transform = Transforms()
+    first = transform.to_uint8(torch.full((1, 3, 4, 4), -1.0))
+    second = transform.to_uint8(torch.full((1, 3, 4, 4), 1.0))
+
+    assert first.shape == (4, 4, 3)
+    assert (first == 0).all() and (second == 255).all()
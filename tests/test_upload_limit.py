@@ -0,0 +1,68 @@
+import io
+import numpy as np
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from PIL import Image, ImageFile
+from utils.upload_limit import UploadLimitMiddleware
+
+
+@pytest.fixture
+def limited():
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, max_bytes=1024)
+    received = []
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = await request.body()
+        received.append(len(body))
+        return {"size": len(body)}
+
+    return TestClient(app), received
+
+
+def test_body_within_limit_passes(limited):
+    client, received = limited
+    response = client.post("/echo", content=b"x" * 1024)
+    assert response.status_code == 200
+    assert received == [1024]
+
+
+def test_oversized_content_length_is_rejected_before_reading(limited):
+    client, received = limited
+    response = client.post("/echo", content=b"x" * 4096)
+    assert response.status_code == 413
+    assert response.headers["connection"] == "close"
+    assert received == []
+
+
+def test_oversized_chunked_body_is_rejected(limited):
+    client, received = limited
+    chunks = [b"x" * 512 for _ in range(8)]
+    response = client.post("/echo", content=iter(chunks))
+    assert response.status_code == 413
+    assert received == []
+
+
+def test_image_with_too_many_pixels_is_rejected_before_decode(tmp_path, monkeypatch):
+    from benchmarks.serving import build_app
+
+    monkeypatch.setenv("SRGAN_JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setenv("SRGAN_CACHE_DIR", "")
+    monkeypatch.setenv("SRGAN_MAX_IMAGE_SIDE", "256")
+    app = build_app(str(tmp_path))
+    buffer = io.BytesIO()
+    Image.fromarray(np.zeros((300, 300, 3), dtype=np.uint8)).save(buffer, format="PNG")
+
+    def load(self):
+        raise AssertionError("пиксели не должны распаковываться")
+
+    monkeypatch.setattr(ImageFile.ImageFile, "load", load)
+    try:
+        client = TestClient(app.app)
+        response = client.post("/upscale", files={"file": ("big.png", buffer.getvalue(), "image/png")})
+        assert response.status_code == 413
+    finally:
+        app.srgan.pool.shutdown()
+        app.srgan.fallback_pool.shutdown()
@@ -1,5 +1,7 @@
 import albumentations as A
 from albumentations.pytorch import ToTensorV2
+import numpy as np
+import torch
 from PIL import Image
 
 class Transforms:
@@ -14,6 +16,22 @@ class Transforms:
             ]
         )
 
+    def to_tensor(self, img_array: np.ndarray, device="cpu") -> torch.Tensor:
+        """
+        HWC uint8 -> 1xCxHxW float32 в [0, 1].
+        Normalize создает новый массив, поэтому вход из np.asarray(PIL.Image)
+        (только для чтения) не копируется отдельно и не дает предупреждений.
+        """
+        return self.original_transform(image=img_array)["image"].unsqueeze(0).to(device)
+
+    def to_uint8(self, SR_image: torch.Tensor) -> np.ndarray:
+        """Выход генератора 1xCxHxW в [-1, 1] -> HWC uint8 без промежуточных float-копий"""
+        image = SR_image.detach()[0].cpu()
+        with torch.inference_mode():
+            # Выход генератора больше не используется, преобразуем на месте
+            image = image.clamp_(-1.0, 1.0).add_(1.0).mul_(127.5)
+            return image.permute(1, 2, 0).to(torch.uint8).numpy()
+
     async def get_lowres_transform(self, image_shape):
         """
         Создает преобразования для low-res изображений на основе размера входного изображения.
@@ -0,0 +1,77 @@
+import os
+import shutil
+import zipfile
+from typing import Optional
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".tif", ".tiff")
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+
+def is_zip(filename: str, content_type: str) -> bool:
+    return (content_type or "") in ZIP_CONTENT_TYPES or (filename or "").lower().endswith(".zip")
+
+
+def list_zip(path: str, max_items: int, max_item_bytes: int = 0, max_total_bytes: Optional[int] = None) -> list:
+    """
+    Изображения zip-архива в виде [ZipInfo] без распаковки (читается только
+    оглавление); служебные файлы и каталоги пропускаются. Размеры из заголовков
+    (каждого элемента и суммарный, None - без лимита) проверяются сразу, но могут быть занижены - фактический объем
+    контролируется при чтении (read_item).
+    """
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise ValueError("Поврежденный zip-архив")
+
+    members = []
+    total = 0
+    with archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+                continue
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if len(members) >= max_items:
+                raise ValueError(f"Слишком много изображений в пакете (максимум {max_items})")
+            # Размер из заголовка проверяется до распаковки
+            if max_item_bytes and info.file_size > max_item_bytes:
+                raise ValueError(f"Файл {name} в архиве слишком большой")
+            total += info.file_size
+            if max_total_bytes is not None and total > max_total_bytes:
+                raise ValueError("Распакованный объем архива превышает лимит")
+            members.append(info)
+    return members
+
+
+def spool(source, path: str, chunk_size: int = 1024 * 1024):
+    """Копирование загруженного файла на диск частями"""
+    source.seek(0)
+    with open(path, "wb") as target:
+        shutil.copyfileobj(source, target, chunk_size)
+
+
+def read_item(path: str, member: Optional[zipfile.ZipInfo] = None, max_bytes: int = 0,
+              chunk_size: int = 1024 * 1024) -> bytes:
+    """
+    Байты изображения пакета: отдельный файл или элемент zip-архива.
+
+    Элемент архива распаковывается частями, и чтение прерывается, как только
+    объем превысит max_bytes, независимо от размера, заявленного в заголовке.
+    """
+    if member is None:
+        with open(path, "rb") as f:
+            return f.read()
+
+    chunks = []
+    total = 0
+    with zipfile.ZipFile(path) as archive, archive.open(member) as stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            total += len(chunk)
+            if max_bytes and total > max_bytes:
+                raise ValueError(f"Файл {member.filename} в архиве слишком большой")
+            chunks.append(chunk)
+    return b"".join(chunks)
@@ -1,30 +1,157 @@
+import asyncio
+import hashlib
 import os
+import shutil
+import urllib.error
+import urllib.request
+import zipfile
+from typing import Optional
 import gdown
 from utils.server_logger import ServerLogger
 
-async def download_model(model_path: str, model_url: str) -> bool:
-    """Скачивание модели с Google Drive"""
-    logger = ServerLogger()
-    
-    model_dir = os.path.dirname(model_path)
-    if not os.path.exists(model_dir):
-        os.makedirs(model_dir, exist_ok=True)
-        logger.info(f"Создана папка: {model_dir}")
-    else:
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _looks_like_checkpoint(path: str) -> bool:
+    """Чекпоинт torch - zip-архив (torch.save) или pickle (старый формат), а не страница ошибки"""
+    if zipfile.is_zipfile(path):
         return True
-    
+    with open(path, "rb") as f:
+        return f.read(1) == b"\x80"
+
+
+def verify_artifact(path: str, sha256: Optional[str] = None, size: Optional[int] = None) -> bool:
+    """
+    Проверка файла модели: существует, не пустой, совпадают размер и контрольная сумма.
+    Без заданной суммы используется записанная при первой проверенной загрузке (.sha256),
+    а файл без записанной суммы должен хотя бы быть чекпоинтом torch.
+    """
+    if not os.path.isfile(path):
+        return False
+    actual_size = os.path.getsize(path)
+    if actual_size == 0 or (size is not None and actual_size != size):
+        return False
+    sha256 = sha256 or _read_text(f"{path}.sha256")
+    if sha256:
+        return file_sha256(path).lower() == sha256.lower()
+    return _looks_like_checkpoint(path)
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_text(path: str, text: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _remove(*paths: str):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _fetch_local(source: str, part_path: str):
+    """Копирование из локального файла или file:// URL"""
+    path = source[len("file://"):] if source.startswith("file://") else source
+    shutil.copyfile(path, part_path)
+
+
+def _fetch_http(url: str, part_path: str, size: Optional[int] = None):
+    """Скачивание по HTTP(S) с докачкой недостающей части через Range"""
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if size is not None and offset >= size:
+        # Докачивать нечего: полный .part уже проверялся, больший - заведомо испорчен
+        os.remove(part_path)
+        offset = 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
     try:
-        # Извлекаем идентификатор файла из URL
-        file_id = model_url.split('/')[-2]
-        
-        # Формируем URL для скачивания
-        download_url = f"https://drive.google.com/uc?id={file_id}"
-        
-        # Скачиваем файл
-        gdown.download(download_url, model_path, quiet=False)
-        
-        logger.info(f"Модель успешно скачана и сохранена по пути: {model_path}")
+        response = urllib.request.urlopen(request, timeout=60)
+    except urllib.error.HTTPError as e:
+        if e.code != 416 or not offset:
+            raise
+        # Диапазон за концом файла: .part не соответствует файлу на сервере
+        os.remove(part_path)
+        return _fetch_http(url, part_path, size)
+    with response:
+        # Сервер без поддержки Range отдает файл целиком
+        mode = "ab" if offset and response.status == 206 else "wb"
+        with open(part_path, mode) as f:
+            shutil.copyfileobj(response, f, CHUNK_SIZE)
+
+
+def _fetch_gdrive(url: str, part_path: str):
+    """Скачивание с Google Drive через gdown (с докачкой)"""
+    file_id = url.split('/')[-2]
+    download_url = f"https://drive.google.com/uc?id={file_id}"
+    gdown.download(download_url, part_path, quiet=False, resume=True)
+
+
+def fetch_artifact(path: str, sources: list, sha256: Optional[str] = None,
+                   size: Optional[int] = None, logger: Optional[ServerLogger] = None) -> bool:
+    """
+    Синхронная загрузка артефакта: источники перебираются по порядку, запись идет
+    во временный файл .part с докачкой, после проверки файл атомарно переносится на место.
+    """
+    logger = logger or ServerLogger()
+    if verify_artifact(path, sha256, size):
+        if not os.path.exists(f"{path}.sha256"):
+            _write_text(f"{path}.sha256", sha256 or file_sha256(path))
         return True
-    except Exception as e:
-        logger.error(f"Ошибка при скачивании модели: {e}")
-        return False
\ No newline at end of file
+    if os.path.exists(path):
+        logger.warning(f"Файл модели поврежден или не совпадает контрольная сумма: {path}")
+        _remove(path, f"{path}.sha256")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    part_path = f"{path}.part"
+    # Источник, из которого скачан .part: докачка возможна только из него же
+    source_path = f"{part_path}.source"
+    for source in sources:
+        try:
+            if os.path.exists(part_path) and _read_text(source_path) != source:
+                _remove(part_path)
+            _write_text(source_path, source)
+
+            logger.info(f"Загрузка модели из {source}")
+            if "drive.google.com" in source:
+                _fetch_gdrive(source, part_path)
+            elif source.startswith(("http://", "https://")):
+                _fetch_http(source, part_path, size)
+            else:
+                _fetch_local(source, part_path)
+
+            if verify_artifact(part_path, sha256, size):
+                os.replace(part_path, path)
+                _remove(source_path)
+                # Сумма первой проверенной загрузки защищает файл при следующих запусках
+                _write_text(f"{path}.sha256", sha256 or file_sha256(path))
+                logger.info(f"Модель успешно скачана и сохранена по пути: {path}")
+                return True
+            logger.error(f"Проверка загруженного файла не пройдена: {source}")
+            _remove(part_path, source_path)
+        except Exception as e:
+            # Частично скачанный .part остается для докачки из того же источника
+            logger.error(f"Ошибка при скачивании модели из {source}: {e}")
+    return False
+
+
+async def download_model(model_path: str, model_url: str, sha256: Optional[str] = None,
+                         size: Optional[int] = None, mirrors: Optional[list] = None) -> bool:
+    """Проверка и при необходимости скачивание модели вне цикла событий (сначала зеркала)"""
+    sources = list(mirrors or []) + ([model_url] if model_url else [])
+    return await asyncio.to_thread(fetch_artifact, model_path, sources, sha256, size)
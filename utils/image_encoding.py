@@ -0,0 +1,50 @@
+import io
+from typing import Optional
+from PIL import Image
+
+# Поддерживаемые форматы вывода: имя -> (формат PIL, Content-Type)
+OUTPUT_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+
+DEFAULT_QUALITY = 90
+DEFAULT_COMPRESS_LEVEL = 6
+
+
+def output_options(output_format: Optional[str] = "png", quality: Optional[int] = None,
+                   compress_level: Optional[int] = None) -> dict:
+    """Проверка и нормализация параметров кодирования результата (None - значение по умолчанию)"""
+    output_format = (output_format or "png").lower()
+    quality = DEFAULT_QUALITY if quality is None else quality
+    compress_level = DEFAULT_COMPRESS_LEVEL if compress_level is None else compress_level
+    if output_format == "jpg":
+        output_format = "jpeg"
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат вывода: {output_format}")
+    if not 1 <= quality <= 100:
+        raise ValueError("Качество должно быть в диапазоне 1-100")
+    if not 0 <= compress_level <= 9:
+        raise ValueError("Уровень сжатия PNG должен быть в диапазоне 0-9")
+
+    options = {"format": output_format}
+    if output_format == "png":
+        options["compress_level"] = compress_level
+    else:
+        options["quality"] = quality
+    return options
+
+
+def media_type(options: dict) -> str:
+    return OUTPUT_FORMATS[options["format"]][1]
+
+
+def encode(img: Image.Image, options: dict) -> bytes:
+    """Кодирование изображения PIL в выбранный формат"""
+    pil_format = OUTPUT_FORMATS[options["format"]][0]
+    params = {key: value for key, value in options.items() if key != "format"}
+    buffer = io.BytesIO()
+    img.save(buffer, format=pil_format, **params)
+    return buffer.getvalue()
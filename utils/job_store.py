@@ -0,0 +1,151 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+
+# Статусы заданий
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    params TEXT NOT NULL,
+    callback_url TEXT,
+    media_type TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+_COLUMNS = ("id", "status", "progress", "params", "callback_url", "media_type", "error", "created_at", "updated_at")
+
+
+class JobStore:
+    """
+    Хранилище заданий: метаданные в SQLite, входные изображения и результаты -
+    файлы в root/files. Переживает перезапуск процесса.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.files_dir = os.path.join(root, "files")
+        os.makedirs(self.files_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # Объем файлов заданий на диске, чтобы не сканировать каталог при каждой проверке
+        self._disk_lock = threading.Lock()
+        self.disk_used = sum(entry.stat().st_size for entry in os.scandir(self.files_dir) if entry.is_file())
+        self._conn = sqlite3.connect(os.path.join(root, "jobs.db"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+
+    def input_path(self, job_id: str) -> str:
+        return os.path.join(self.files_dir, f"{job_id}.input")
+
+    def result_path(self, job_id: str) -> str:
+        return os.path.join(self.files_dir, f"{job_id}.result")
+
+    def _write_atomic(self, path: str, data: bytes):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._disk_lock:
+            self.disk_used += len(data)
+
+    def _row(self, row) -> dict:
+        job = dict(zip(_COLUMNS, row))
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def create(self, image_data: bytes, params: dict, callback_url: Optional[str] = None) -> dict:
+        job_id = uuid.uuid4().hex
+        # Сначала файл, затем запись: задание в базе всегда имеет входные данные
+        self._write_atomic(self.input_path(job_id), image_data)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, progress, params, callback_url, created_at, updated_at)"
+                " VALUES (?, ?, 0, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params), callback_url, now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def read_input(self, job_id: str) -> bytes:
+        with open(self.input_path(job_id), "rb") as f:
+            return f.read()
+
+    def read_result(self, job_id: str) -> bytes:
+        with open(self.result_path(job_id), "rb") as f:
+            return f.read()
+
+    def complete(self, job_id: str, result: bytes, media_type: str):
+        """Сохранение результата; входной файл больше не нужен"""
+        self._write_atomic(self.result_path(job_id), result)
+        self.update(job_id, status=DONE, progress=1.0, media_type=media_type)
+        self._remove(self.input_path(job_id))
+
+    def fail(self, job_id: str, error: str):
+        self.update(job_id, status=FAILED, error=error)
+        self._remove(self.input_path(job_id))
+
+    def unfinished(self) -> list:
+        """Незавершенные задания в порядке поступления (после перезапуска выполняются заново)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge(self, older_than_sec: float) -> int:
+        """Удаление завершенных заданий старше older_than_sec вместе с файлами"""
+        cutoff = time.time() - older_than_sec
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (*FINISHED, cutoff)
+            ).fetchall()
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", rows)
+        for (job_id,) in rows:
+            self._remove(self.input_path(job_id))
+            self._remove(self.result_path(job_id))
+        return len(rows)
+
+    def counts(self) -> dict:
+        """Число заданий по статусам"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _remove(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._disk_lock:
+            self.disk_used -= size
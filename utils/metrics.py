@@ -0,0 +1,153 @@
+import bisect
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+# Границы корзин гистограмм по умолчанию (секунды)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Границы корзин для количества пикселей
+PIXEL_BUCKETS = (4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+def _escape(value) -> str:
+    """Экранирование значения метки по формату Prometheus: обратная косая черта, кавычка, перевод строки"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    items = ",".join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items()))
+    return "{" + items + "}"
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus с метками"""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, count, total) in self._series.items():
+                labels = dict(key)
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_labels(dict(labels, le=bound))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(dict(labels, le='+Inf'))} {count}")
+                lines.append(f"{self.name}_count{_labels(labels)} {count}")
+                lines.append(f"{self.name}_sum{_labels(labels)} {total}")
+        return lines
+
+
+class Counter:
+    """Монотонный счетчик с метками"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_labels(dict(key))} {value}")
+        return lines
+
+
+class Gauge:
+    """Значение, вычисляемое при сборе метрик"""
+
+    def __init__(self, name: str, help_text: str, getter):
+        self.name = name
+        self.help_text = help_text
+        self.getter = getter
+
+    def render(self) -> list:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.getter()}",
+        ]
+
+
+def process_rss_bytes() -> int:
+    """Текущий RSS процесса (Linux /proc), иначе пиковый RSS"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Metrics:
+    """Метрики сервиса для эндпоинта /metrics"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.stage_seconds = Histogram("srgan_stage_seconds", "Длительность стадий обработки /upscale")
+        self.input_pixels = Histogram("srgan_input_pixels", "Количество пикселей входного изображения", PIXEL_BUCKETS)
+        self.output_pixels = Histogram("srgan_output_pixels", "Количество пикселей результата", PIXEL_BUCKETS)
+        self.errors = Counter("srgan_errors_total", "Ошибки обработки запросов по причинам")
+        self.requests = Counter("srgan_requests_total", "Обработанные запросы")
+        self.cancelled = Counter("srgan_cancelled_total", "Отмененная работа: истекший срок или отключение клиента")
+        self.fallbacks = Counter("srgan_fallbacks_total", "Упрощенные ответы под нагрузкой по причинам")
+        self._collectors = [
+            self.stage_seconds,
+            self.input_pixels,
+            self.output_pixels,
+            self.errors,
+            self.requests,
+            self.fallbacks,
+            self.cancelled,
+            Gauge("srgan_requests_in_flight", "Запросы в обработке", lambda: self.in_flight),
+            Gauge("srgan_process_resident_memory_bytes", "RSS процесса", process_rss_bytes),
+        ]
+
+    def add_gauge(self, name: str, help_text: str, getter):
+        self._collectors = [c for c in self._collectors if c.name != name]
+        self._collectors.append(Gauge(name, help_text, getter))
+
+    @contextmanager
+    def time(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds.observe(time.perf_counter() - started, stage=stage)
+
+    def render(self) -> str:
+        lines = []
+        for collector in self._collectors:
+            lines.extend(collector.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
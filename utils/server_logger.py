@@ -1,21 +1,46 @@
+import atexit
 import logging
-from datetime import datetime
+import logging.handlers
 import os
+import queue
+import random
+import threading
+from datetime import datetime
+from utils.config import env_float, env_str
+
+_setup_lock = threading.Lock()
+_listener = None
+
+
+class StructuredFormatter(logging.Formatter):
+    """Формат логов с дополнительными структурированными полями key=value"""
+
+    def format(self, record):
+        message = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return message
+
+
+def _configure(logger: logging.Logger, log_dir: str):
+    """
+    Однократная настройка обработчиков: запись в файл и консоль выполняет
+    фоновый поток QueueListener, а вызывающий поток только кладет запись в очередь.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
 
-class ServerLogger:
-    def __init__(self, log_dir: str = "logs/server"):
-        self.logger = logging.getLogger("server_logger")
-        self.logger.setLevel(logging.DEBUG)
-        
         # Создаем директорию для логов, если её нет
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-            
+        os.makedirs(log_dir, exist_ok=True)
+
         # Формат логов
-        formatter = logging.Formatter(
+        formatter = StructuredFormatter(
             '%(asctime)s - %(levelname)s - %(message)s'
         )
-        
+
         # Файловый обработчик
         file_handler = logging.FileHandler(
             os.path.join(log_dir, f"server_{datetime.now().strftime('%Y%m%d')}.log"),
@@ -23,40 +48,62 @@ class ServerLogger:
         )
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(formatter)
-        
+
         # Консольный обработчик
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(formatter)
-        
-        # Очищаем существующие обработчики
-        if self.logger.handlers:
-            self.logger.handlers.clear()
-            
-        # Добавляем обработчики
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
-
-    def debug(self, message: str):
-        self.logger.debug(message)
-    
-    def info(self, message: str):
-        self.logger.info(message)
-    
-    def warning(self, message: str):
-        self.logger.warning(message)
-    
-    def error(self, message: str):
-        self.logger.error(message)
-    
+
+        log_queue = queue.SimpleQueue()
+        logger.handlers.clear()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+class ServerLogger:
+    def __init__(self, log_dir: str = None):
+        self.logger = logging.getLogger("server_logger")
+        self.logger.setLevel(logging.DEBUG)
+        _configure(self.logger, log_dir or env_str("SRGAN_LOG_DIR", "logs/server"))
+
+        # Доля записываемых отладочных сообщений по запросам (1.0 - все, 0 - ни одного)
+        self.debug_sample_rate = env_float("SRGAN_DEBUG_LOG_SAMPLE_RATE", 1.0)
+
+    def _log(self, level: int, message: str, fields: dict):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, extra={"fields": fields})
+
+    def debug(self, message: str, **fields):
+        self._log(logging.DEBUG, message, fields)
+
+    def sampled_debug(self, message: str, **fields):
+        """Отладочное сообщение горячего пути, записывается с вероятностью debug_sample_rate"""
+        if self.debug_sample_rate >= 1.0 or random.random() < self.debug_sample_rate:
+            self._log(logging.DEBUG, message, fields)
+
+    def info(self, message: str, **fields):
+        self._log(logging.INFO, message, fields)
+
+    def warning(self, message: str, **fields):
+        self._log(logging.WARNING, message, fields)
+
+    def error(self, message: str, **fields):
+        self._log(logging.ERROR, message, fields)
+
     def log_request(self, method: str, path: str, status_code: int):
         self.info(f"Запрос: {method} {path} - Статус: {status_code}")
-    
+
     def log_model_status(self, status: str):
         self.info(f"Статус модели: {status}")
-    
+
     def log_image_processing(self, image_size: int, shape: tuple = None):
-        self.debug(f"Обработка изображения: размер={image_size} байт, форма={shape}")
-    
+        self.sampled_debug("Обработка изображения", size_bytes=image_size, shape=shape)
+
     def log_error(self, error: Exception, context: str = ""):
-        self.error(f"Ошибка в {context}: {str(error)}")
\ No newline at end of file
+        self.error(f"Ошибка в {context}: {str(error)}")
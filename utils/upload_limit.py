@@ -0,0 +1,48 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+class ImageTooLargeError(ValueError):
+    """Размеры изображения по заголовку превышают допустимые (ответ 413)"""
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware, ограничивающее размер тела запроса.
+
+    Запрос с Content-Length больше лимита отклоняется до чтения тела, а при
+    передаче без длины (chunked) - как только полученный объем превысит лимит,
+    не дожидаясь загрузки и разбора всего multipart.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def _detail(self) -> str:
+        return f"Размер запроса превышает {self.max_bytes // (1024 * 1024)} МБ"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": self._detail()}, status_code=413, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Обрабатывается ExceptionMiddleware приложения как ответ 413
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)